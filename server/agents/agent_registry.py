@@ -0,0 +1,79 @@
+"""
+This module defines a process-wide registry of AI agents, so that each worker
+builds an agent once per tool configuration and reuses it across requests.
+"""
+
+# -- Standard libraries --
+import logging
+import threading
+from typing import Callable
+
+# -- Custom Modules --
+from .ai_agent import AIAgent
+
+
+logger = logging.getLogger(__name__)
+
+
+class AgentRegistry:
+    """
+    A thread-safe registry that caches agent instances keyed by their class and tool names.
+
+    Agents hold no per-request state, so a single instance can serve concurrent requests.
+    Agents restricted to a subset of a tool set are derived from the agent holding the whole set,
+    so that the LLM, embeddings and tools are built once per process and each subset only builds its executor.
+    """
+    _agents: dict[tuple, AIAgent] = {}
+    # One lock per agent being built, so a slow build does not hold up requests for other agents
+    _build_locks: dict[tuple, threading.Lock] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_agent(cls, agent_class: type[AIAgent], tool_names: list[str] = [], available_tools: list[str] = None) -> AIAgent:
+        """
+        Returns the shared agent for the given class and tool set, building it on first use.
+
+        Args:
+            agent_class (type[AIAgent]): The agent class to instantiate.
+            tool_names (list[str]): The names of the tools the agent will use.
+            available_tools (list[str]): The tool set the tools were selected from, if any.
+                The agent is then derived from the shared agent holding all of them.
+        """
+        key = (agent_class, frozenset(tool_names))
+
+        if available_tools is None:
+            return cls._get_or_build(key, lambda: agent_class(tool_names=sorted(key[1])))
+
+        base_agent = cls.get_agent(agent_class, available_tools)
+        return cls._get_or_build(key, lambda: base_agent.with_tools(sorted(key[1])))
+
+    @classmethod
+    def _get_or_build(cls, key: tuple, build: Callable[[], AIAgent]) -> AIAgent:
+        """
+        Returns the cached agent for the key, building it under the key's own lock on first use.
+        """
+        agent = cls._agents.get(key)
+        if agent is not None:
+            return agent
+
+        with cls._lock:
+            build_lock = cls._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            # Another thread may have built the agent while we waited for the lock
+            agent = cls._agents.get(key)
+            if agent is None:
+                logger.info(f"Building {key[0].__name__} with tools: {sorted(key[1])}")
+                agent = build()
+                cls._agents[key] = agent
+
+        return agent
+
+    @classmethod
+    def clear(cls):
+        """
+        Drops every cached agent, forcing them to be rebuilt on next use.
+        """
+        with cls._lock:
+            cls._agents.clear()
+            cls._build_locks.clear()
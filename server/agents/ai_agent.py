@@ -4,6 +4,7 @@ This module defines a general structure for AI agents in the app.
 
 # -- Standard libraries --
 import re
+import copy
 from pydantic import BaseModel
 import os
 # -- 3rd Party libraries --
@@ -54,7 +55,8 @@ class AIAgent:
                 MessagesPlaceholder(variable_name="agent_scratchpad"),
             ]
         )
-        self.tools = self._create_agent_tools(tool_names)
+        self.tool_map = self._create_agent_tools(tool_names)
+        self.tools = list(self.tool_map.values())
         # agent = create_react_agent(llm=self.llm, tools=self.tools, prompt=self.prompt)
         # self.agent_executor:RunnableSerializable = AgentExecutor(agent, tools=[])
 
@@ -68,6 +70,27 @@ class AIAgent:
         result = self.agent_executor({"input": message})
         return result["output"]
 
+    def with_tools(self, tool_names: list[str]) -> "AIAgent":
+        """
+        Returns a copy of the agent restricted to a subset of its tools.
+        The copy shares the database, LLM, embeddings and tools of this agent, and only builds its own executor.
+
+        Args:
+            tool_names: The names of the tools the copy will use, among the ones of this agent.
+        """
+        agent = copy.copy(self)
+        agent.tool_map = {name: tool for name, tool in self.tool_map.items() if name in tool_names}
+        agent.tools = list(agent.tool_map.values())
+        agent._build_executor()
+
+        return agent
+
+    def _build_executor(self):
+        """
+        Builds the agent's executor over its tools. Agents that run one define it.
+        """
+        pass
+
     def _get_vector_store_retriever(self, collection_name, top_k=3) -> VectorStoreRetriever:
         """
         Returns a vector store retriever for a given collection using FAISS.
@@ -119,9 +142,25 @@ class AIAgent:
         return retriever
 
 
-    def _create_agent_tools(self, tool_names=[]) -> list[Tool]:
+    def _get_vector_store_from_embeddings(self, texts: list[str], vectors: list[list[float]], metadatas: list[dict] = None) -> FAISS:
         """
-        Returns a list of agent tools.
+        Returns an in-memory FAISS vector store built from precomputed embeddings.
+
+        Args:
+            texts: The texts to index.
+            vectors: The embedding vector of each text.
+            metadatas: Optional metadata stored with each text.
+        """
+        return FAISS.from_embeddings(
+            text_embeddings=list(zip(texts, vectors)),
+            embedding=self.embedding_model,
+            metadatas=metadatas,
+        )
+
+
+    def _create_agent_tools(self, tool_names=[]) -> dict[str, Tool]:
+        """
+        Returns the agent tools, keyed by their name in the toolbox.
 
         Args:
             schema: A list of object names that defines which custom tools the agent will use.
@@ -136,19 +175,17 @@ class AIAgent:
             } for section_name, section_dict in toolbox.items()
         }
 
-        community_tools = []
+        community_tools = {}
         for tool_name, tool_val in target_tools.get("community").items():
-            community_tools.append(tool_val)
+            community_tools[tool_name] = tool_val
 
-        custom_tools = []
+        custom_tools = {}
         for tool_name, tool_dict in target_tools.get("custom").items():
             func = tool_dict.get("func")
             description = tool_dict.get("description")
 
             if tool_dict.get("structured", False):
-                custom_tools.append(
-                    StructuredTool.from_function(func)
-                )
+                custom_tools[tool_name] = StructuredTool.from_function(func)
                 continue
             
             elif tool_dict.get("retriever", False):
@@ -166,23 +203,19 @@ class AIAgent:
                 def retriever_func(query: str):
                     return retriever_chain.invoke(query)
 
-                custom_tools.append(
-                    StructuredTool(
-                        name=f"vector_search_{tool_name}",
-                        func=retriever_func,
-                        description=description,
-                        args_schema=RetrieverInput
-                    )
+                custom_tools[tool_name] = StructuredTool(
+                    name=f"vector_search_{tool_name}",
+                    func=retriever_func,
+                    description=description,
+                    args_schema=RetrieverInput
                 )
             else: 
-                custom_tools.append(
-                    Tool(
-                        name=f"{tool_name}",
-                        func=func,
-                        description=description
-                    )
+                custom_tools[tool_name] = Tool(
+                    name=f"{tool_name}",
+                    func=func,
+                    description=description
                 )
 
-        result_tools = community_tools + custom_tools
+        result_tools = {**community_tools, **custom_tools}
 
         return result_tools
\ No newline at end of file
@@ -13,8 +13,11 @@ This module defines a class used to generate AI agents centered around mental he
 from datetime import datetime
 import logging
 import json
-import asyncio
 from operator import itemgetter
+from queue import Queue
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from threading import Thread
+from typing import Iterator
 
 # -- 3rd Party libraries --
 # import spacy
@@ -24,26 +27,64 @@ from operator import itemgetter
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain.memory.chat_memory import BaseChatMemory
-from langchain.memory.summary import ConversationSummaryMemory
 from langchain_core.runnables import RunnablePassthrough
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_mongodb.chat_message_histories import MongoDBChatMessageHistory
 from langchain_core.messages import trim_messages
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages.human import HumanMessage
+from langchain_core.messages import AIMessage
+from langchain_core.messages import BaseMessage
+from langchain_community.vectorstores import FAISS
 
 
 # MongoDB
 # -- Custom modules --
 from .ai_agent import AIAgent
+from .parallel_executor import ParallelAgentExecutor
+from .prompt_builder import build_agent_prompt
+from .streaming import QueueCallbackHandler
 from services.azure_mongodb import MongoDBClient
+from services.db.chat_history import get_chat_history
+from services.db.chat_session import register_chat_session
+from services.db.user_greeting import get_user_greeting, save_user_greeting
+from services.db.user import get_user_profile_facts, get_user_name
+from services.response_cache import response_cache, is_shareable_question, SHAREABLE_TOOLS
+from services.db.user_journey import get_user_journey_facts
+from services.db.chat_summary import (
+    get_past_summaries,
+    get_recent_digests,
+    get_chat_summary,
+    fit_to_token_limit,
+    get_summary_embeddings,
+    save_summary_embedding,
+    get_summary_version,
+    get_cached_summary_store,
+    cache_summary_store,
+    invalidate_summary_cache,
+    is_first_chat,
+)
 # Constants
 from utils.consts import SYSTEM_MESSAGE
 from utils.consts import PROCESSING_STEP
+from utils.consts import SUMMARY_RETRIEVAL_TOP_K
+from utils.consts import SUMMARY_CHUNK_TOKEN_LIMIT, SUMMARY_TRANSCRIPT_TOKEN_LIMIT, SUMMARY_MAX_CONCURRENCY
+from utils.consts import HISTORY_WINDOW_TOKEN_LIMIT
+from utils.consts import CONTEXT_PREFETCH_WORKERS, CONTEXT_PREFETCH_TIMEOUT
+from utils.consts import AGENT_RUN_TIMEOUT, AGENT_MAX_ITERATIONS
+from utils.consts import AGENT_NAME
+from utils.consts import ANONYMOUS_USER_ID, ANONYMOUS_GREETING, FIRST_SESSION_GREETING, FIRST_SESSION_INSTRUCTIONS
+from utils.token_counter import count_tokens, count_message_tokens, get_token_counter
+from utils.compression import compress_text, decompress_text
+from utils.async_runner import gather_async
+from utils.deadline import deadline, bound_timeout
 
 # Load spaCy model
 # nlp = spacy.load("en_core_web_sm")
 
+# Shared by all turns to fetch their context concurrently
+_context_executor = ThreadPoolExecutor(max_workers=CONTEXT_PREFETCH_WORKERS, thread_name_prefix="turn-context")
+
 
 class MentalHealthAIAgent(AIAgent):
     """
@@ -66,57 +107,74 @@ class MentalHealthAIAgent(AIAgent):
             None
         """
         super().__init__(system_message, tool_names)
+        self._build_executor()
 
-        
-
-        self.prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", self.system_message.content),
-                ("system", "{past_summaries}"),
-                ("system", "You can retrieve information about the AI using the 'agent_facts' tool."),
-                ("system", "You can generate suggestions using the 'generate_suggestions' tool."),
-                ("system", "You can search for information using the 'web_search_google' tool."),
-                ("system", "You can search for information using the 'web_search_bing' tool."),
-                ("system", "You can search for information using the 'web_search_youtube' tool."),
-                ("system", "You can search for information using the 'web_search_tavily' tool."),
-                ("system", "You can search for locations using the 'location_search_gplaces' tool."),
-                ("system", "You can retrieve your user profile using the 'user_profile_retrieval' tool."),
-                ("system", "You can retrieve your user journey using the 'user_journey_retrieval' tool."),
-                ("system", "user_id:{user_id}"),
-                MessagesPlaceholder(variable_name="chat_turns"),
-                ("human", "{input}"),
-                MessagesPlaceholder(variable_name="agent_scratchpad"),
-            ]
-        )
+    def _build_executor(self):
+        """
+        Builds the prompt and the executor of the agent over its tools.
+        """
+        # The static prefix of the prompt comes first and is shared by every turn, for provider-side caching
+        self.prompt = build_agent_prompt(self.system_message.content, tuple(sorted(self.tool_map)))
 
         self.agent = create_tool_calling_agent(self.llm, self.tools, self.prompt)
-        executor:AgentExecutor = AgentExecutor(
-            agent=self.agent, tools=self.tools, verbose=True, handle_parsing_errors=True)
-        self.agent_executor = self.get_agent_with_history(executor)
+        # The turn's history is prefetched with the rest of its context, and the turn is saved once answered
+        # Intermediate steps tell which tools a response was built with, before it is cached
+        self.agent_executor:AgentExecutor = ParallelAgentExecutor(
+            agent=self.agent, tools=self.tools, verbose=True, handle_parsing_errors=True,
+            return_intermediate_steps=True, max_iterations=AGENT_MAX_ITERATIONS)
 
 
-    def get_session_history(self, session_id: str) -> MongoDBChatMessageHistory:
+    def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
         """
         Retrieves the chat history for a given session ID from the database.
+        The history shares the process-wide MongoDB client.
 
         Args:
             session_id (str): The session ID to retrieve the chat history for.
         """
-        CONNECTION_STRING = MongoDBClient.get_mongodb_variables()
+        history = get_chat_history(session_id)
+
+        logging.info(f"Retrieved chat history for session {session_id}")
+        return history
+
+    def get_chat_messages(self, user_id: str, chat_ids: list) -> list[list[BaseMessage]]:
+        """
+        Retrieves the full message history of one or more chats of a user.
+        A single chat is read synchronously, several chats are fetched concurrently on the shared event loop.
+
+        Args:
+            user_id (str): The ID of the user.
+            chat_ids (list): The IDs of the chats to read.
+
+        Returns:
+            list[list[BaseMessage]]: The messages of each chat, oldest first, in the order of `chat_ids`.
+        """
+        histories = [self.get_session_history(f"{user_id}-{chat_id}") for chat_id in chat_ids]
+        if len(histories) == 1:
+            return [histories[0].messages]
 
-        history = MongoDBChatMessageHistory(
-            CONNECTION_STRING,
+        return gather_async(history.aget_messages() for history in histories)
+
+    def get_windowed_session_history(self, session_id: str) -> BaseChatMessageHistory:
+        """
+        Retrieves the chat history loaded into the prompt on every turn. Only the most recent messages
+        that fit in the token budget are read, preceded by the chat's rolling summary when older messages are left out.
+
+        Args:
+            session_id (str): The session ID to retrieve the chat history for, formatted as `{user_id}-{chat_id}`.
+        """
+        user_id, _, chat_id = session_id.rpartition("-")
+
+        summary_loader = None
+        if chat_id.isdigit():
+            summary_loader = lambda: get_chat_summary(user_id, int(chat_id))
+
+        return get_chat_history(
             session_id,
-            MongoDBClient.get_db_name(),
-            collection_name="chat_turns"
+            token_limit=HISTORY_WINDOW_TOKEN_LIMIT,
+            summary_loader=summary_loader
         )
 
-        logging.info(f"Retrieved chat history for session {history}")
-        if history is None:
-            return []
-        else:
-            return history
-
     def get_agent_memory(self, user_id:str, chat_id:int) -> BaseChatMemory:
             """
             Retrieves the agent's memory given the ID's for a specific user and chat instance.
@@ -151,7 +209,7 @@ class MentalHealthAIAgent(AIAgent):
 
         agent_with_history = RunnableWithMessageHistory(
             agent_executor,
-            get_session_history=self.get_session_history,
+            get_session_history=self.get_windowed_session_history,
             input_messages_key="input",
             history_messages_key="chat_turns",
             verbose=True
@@ -180,8 +238,7 @@ class MentalHealthAIAgent(AIAgent):
         return suggestions
 
     def get_user_mood(self, user_id, chat_id):
-        history:BaseChatMessageHistory = self.get_session_history(f"{user_id}-{chat_id}")
-        history_log = asyncio.run(history.aget_messages()) # Running async function as synchronous
+        history_log = self.get_chat_messages(user_id, [chat_id])[0]
 
         # Get perceived mood
         instructions = """
@@ -201,13 +258,12 @@ class MentalHealthAIAgent(AIAgent):
         trimmer = trim_messages(
             max_tokens=65,
             strategy="last",
-            token_counter=self.llm,
+            token_counter=get_token_counter(),
             include_system=True,
             allow_partial=False,
             start_on="human",
         )
 
-        trimmer.invoke(history_log)
         chain = RunnablePassthrough.assign(messages=itemgetter("messages") | trimmer) | prompt | self.llm
         response = chain.invoke({"messages": history_log})
         user_mood = None if response.content == "None" else response.content
@@ -217,40 +273,103 @@ class MentalHealthAIAgent(AIAgent):
         return user_mood
 
 
-    def exec_update_step(self, user_id, chat_id=None, turn_id=None):
-        # Chat Summary:
-        # Update every 5 chat turns
-        # Therapy Material
-        # Maybe not get it from DB at all? Just perform Bing search?
-        # User Entity:
-        # Can be saved from chat summary step, every 5 chat turns
-        # User Journey:
-        # Can be either updated at the end of the chat, or every 5 chat turns
-        # User Material:
-        # Possibly updated every 5 chat turns, at the end of a chat, or not at all
+    def exec_update_step(self, user_id, chat_id=None, turn_id=None, min_new_turns: int = PROCESSING_STEP) -> str:
+        """
+        Folds the chat turns that are not yet part of the chat's summary into it,
+        once at least `min_new_turns` turns have accumulated.
+        Meant to run in the background every few turns, so that finalizing a chat only has to fold the last few turns
+        and a chat that is never finalized still has a usable summary.
 
+        Args:
+            user_id (str): The ID of the user.
+            chat_id (int): The ID of the chat.
+            turn_id (int): The ID of the latest turn in the chat.
+            min_new_turns (int): The number of new turns required before the summary is updated.
 
+        Returns:
+            str: The chat's summary after the update.
+        """
+        db_client = MongoDBClient.get_client()
+        db = db_client[MongoDBClient.get_db_name()]
+        chat_summary_collection = db["chat_summaries"]
 
-        # agent_with_history = RunnableWithMessageHistory(
-        #     chain,
-        #     get_session_history=lambda _: memory,
-        #     input_messages_key="input",
-        #     history_messages_key="history",
-        #     verbose=True
-        # )
-        
+        chat_summary = chat_summary_collection.find_one(
+            {"user_id": user_id, "chat_id": int(chat_id)},
+            {"summary_text": 1, "summarized_message_count": 1}
+        ) or {}
+        summary = decompress_text(chat_summary.get("summary_text")) or ""
+        summarized_count = chat_summary.get("summarized_message_count") or 0
 
-        # self.agent = create_tool_calling_agent(self.llm, self.tools, self.prompt)
-        # stateless_agent_executor:AgentExecutor = AgentExecutor(
-        #     agent=self.agent, tools=self.tools, verbose=True, handle_parsing_errors=True)
-        
-        # history=self.get_session_history(f"{user_id}-{chat_id}-{}")
-        # Must invoke with an agent that will not write to DB
-        # invocation = stateless_agent_executor.invoke(
-        #     {"input": f"{message}\nuser_id:{user_id}", "agent_scratchpad": []})
+        # Only the messages after the summarized ones are read, once enough of them have accumulated
+        history = self.get_session_history(f"{user_id}-{chat_id}")
+        new_count = history.count_messages() - summarized_count
 
-        # Get summary text
-        pass
+        # A turn is a human message and the AI's response
+        if new_count <= 0 or new_count < min_new_turns * 2:
+            return summary
+
+        new_messages = history.get_messages(offset=summarized_count)
+        if not new_messages:
+            return summary
+
+        if summary:
+            summary = self.get_updated_summary(summary, new_messages)
+        else:
+            summary = self.get_summary_from_messages(new_messages)
+
+        # Only write if no other update folded the same messages in the meantime.
+        # The embedding of the previous summary no longer matches it, so it is dropped to be recomputed.
+        result = chat_summary_collection.update_one(
+            {
+                "user_id": user_id,
+                "chat_id": int(chat_id),
+                # Chats started before the count was stored do not have the field
+                "summarized_message_count": summarized_count if summarized_count else {"$in": [0, None]}
+            },
+            {
+                "$set": {
+                    "summary_text": compress_text(summary, "chat_summaries"),
+                    "summarized_message_count": summarized_count + len(new_messages)
+                },
+                "$unset": {"summary_vector": ""}
+            }
+        )
+        if not result.modified_count:
+            # Another update won, its summary is the one stored
+            return get_chat_summary(user_id, int(chat_id))
+
+        invalidate_summary_cache(user_id)
+
+        return summary
+
+    def get_updated_summary(self, summary: str, new_messages: list[BaseMessage]) -> str:
+        """
+        Folds new messages into an existing chat summary in a single LLM call.
+
+        Args:
+            summary (str): The current summary of the chat.
+            new_messages (list[BaseMessage]): The messages that came after the summary was written, oldest first.
+        """
+        chunks = MentalHealthAIAgent.get_transcript_chunks(new_messages)
+        # Condense very long stretches of new messages before folding them in
+        new_lines = chunks[0] if len(chunks) == 1 else self.get_summary_from_messages(new_messages)
+
+        instructions = """
+        You are given the summary of a therapy session so far, followed by the latest part of the conversation.
+        Update the summary so that it also covers the latest part, and return only the updated summary.
+        Keep the user's concerns, feelings, important life events, and any advice, goals or exercises that were agreed on.
+        Be concise and write in the third person.
+        """
+
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", instructions),
+                ("human", "Summary so far:\n{summary}\n\nLatest conversation:\n{new_lines}"),
+            ]
+        )
+
+        chain = prompt | self.llm | StrOutputParser()
+        return chain.invoke({"summary": summary, "new_lines": new_lines})
     
     @staticmethod
     def get_chat_id(user_id):
@@ -268,6 +387,257 @@ class MentalHealthAIAgent(AIAgent):
         return most_recent_chat_summary.get("chat_id")
 
 
+    def get_summary_vector_store(self, user_id: str) -> FAISS | None:
+        """
+        Retrieves the vector store over the user's past chat summaries, building it on first use.
+        Summaries stored before embeddings were introduced are embedded and saved on the way.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+        """
+        version = get_summary_version(user_id)
+        store = get_cached_summary_store(user_id, version)
+        if store is not None:
+            return store
+
+        summaries = get_summary_embeddings(user_id)
+        if not summaries:
+            return None
+
+        missing = [summary for summary in summaries if not summary.get("summary_vector")]
+        if missing:
+            vectors = self.embedding_model.embed_documents([summary["summary_text"] for summary in missing])
+            for summary, vector in zip(missing, vectors):
+                summary["summary_vector"] = vector
+                save_summary_embedding(user_id, summary["chat_id"], vector)
+
+        store = self._get_vector_store_from_embeddings(
+            texts=[summary["summary_text"] for summary in summaries],
+            vectors=[summary["summary_vector"] for summary in summaries],
+            metadatas=[{"chat_id": summary["chat_id"]} for summary in summaries],
+        )
+        cache_summary_store(user_id, store, version)
+
+        return store
+
+    def get_relevant_summaries(self, user_id: str, message: str) -> list[str]:
+        """
+        Retrieves the past chat summaries most relevant to the user's message, newest first and within the token budget.
+        Falls back to the most recent summaries when there is no message or too few summaries to choose from.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+            message (str): The user's message.
+        """
+        recent_summaries = get_past_summaries(user_id)
+        if not message:
+            return recent_summaries
+
+        store = self.get_summary_vector_store(user_id)
+        if store is None or store.index.ntotal <= SUMMARY_RETRIEVAL_TOP_K:
+            return recent_summaries
+
+        docs = store.similarity_search(message, k=SUMMARY_RETRIEVAL_TOP_K)
+        docs.sort(key=lambda doc: doc.metadata["chat_id"], reverse=True)
+
+        return fit_to_token_limit([doc.page_content for doc in docs])
+
+    def get_session_window(self, user_id: str, chat_id: int = None) -> tuple[str, list[BaseMessage]]:
+        """
+        Reads the recent messages of a session loaded into the prompt.
+        The user's latest session is looked up only when no chat ID is given.
+
+        Returns:
+            tuple[str, list[BaseMessage]]: The session ID and its recent messages, oldest first.
+        """
+        session_id = MentalHealthAIAgent.get_session_id(user_id, chat_id)
+
+        return session_id, self.get_windowed_session_history(session_id).messages
+
+    @staticmethod
+    def get_session_id(user_id: str, chat_id: int = None) -> str:
+        """
+        Builds the ID of a chat session, using the user's latest chat when no chat ID is given.
+        """
+        if chat_id is None:
+            chat_id = MentalHealthAIAgent.get_chat_id(user_id)
+
+        # TODO: throw error if user_id, chat_id is set to None.
+        return f"{user_id}-{chat_id}"
+
+    def get_past_context(self, user_id: str, message: str) -> str:
+        """
+        Retrieves digests of older periods and the past conversation summaries most relevant to the message.
+        """
+        digests = get_recent_digests(user_id)
+        return "\n".join(digests + self.get_relevant_summaries(user_id, message))
+
+    @staticmethod
+    def get_user_context(user_id: str) -> str:
+        """
+        Retrieves compact facts from the user's profile and journey, so the agent rarely needs to call the retrieval tools.
+        Missing or unavailable facts are left out rather than failing the turn.
+        """
+        facts = []
+        for label, fetch_facts in (("Profile", get_user_profile_facts), ("Journey", get_user_journey_facts)):
+            try:
+                user_facts = fetch_facts(user_id)
+            except Exception as e:
+                logging.warning(f"Could not retrieve {label.lower()} facts for user {user_id}: {e}")
+                continue
+            if user_facts:
+                facts.append(f"{label}: {user_facts}")
+
+        if not facts:
+            return ""
+
+        return "What you already know about the user, no need to retrieve it with a tool:\n" + "\n".join(facts)
+
+    @staticmethod
+    def get_session_context(user_id: str, chat_id: int = None) -> str:
+        """
+        Retrieves the per-session instructions of a chat, the introduction for turns of the user's first session.
+        """
+        if user_id == ANONYMOUS_USER_ID:
+            return ""
+
+        if chat_id is None:
+            chat_id = MentalHealthAIAgent.get_chat_id(user_id)
+
+        return FIRST_SESSION_INSTRUCTIONS if is_first_chat(user_id, chat_id) else ""
+
+    def get_invocation_args(self, message: str, user_id: str, chat_id: int = None) -> tuple[dict, str]:
+        """
+        Assembles the context of a turn and builds the inputs used to invoke the agent executor.
+        The session's history and instructions, the past summaries, and the user's profile and journey are fetched concurrently.
+
+        Args:
+            message (str): The message to be processed by the agent.
+            user_id (str): A unique identifier for the user.
+            chat_id (int): The ID of the chat the turn belongs to, the user's latest chat if not given.
+
+        Returns:
+            tuple[dict, str]: The executor inputs and the ID of the session the turn belongs to.
+        """
+        inputs = {
+            "input": message,
+            "user_id": user_id,
+            "past_summaries": "",
+            "session_context": "",
+            "user_context": "",
+            "chat_turns": [],
+            "agent_scratchpad": []
+        }
+
+        window_future = _context_executor.submit(self.get_session_window, user_id, chat_id)
+        past_context_future = _context_executor.submit(self.get_past_context, user_id, message)
+        user_context_future = _context_executor.submit(MentalHealthAIAgent.get_user_context, user_id)
+        session_context_future = _context_executor.submit(MentalHealthAIAgent.get_session_context, user_id, chat_id)
+
+        # Context that is not ready in time is left out, so the agent keeps most of the run's time to answer.
+        # The waits share a single budget, each one only gets the time the previous ones left.
+        with deadline(CONTEXT_PREFETCH_TIMEOUT):
+            window = MentalHealthAIAgent.wait_for_context(window_future, "chat history", None)
+            past_summaries = MentalHealthAIAgent.wait_for_context(past_context_future, "past summaries", "")
+            user_context = MentalHealthAIAgent.wait_for_context(user_context_future, "user facts", "")
+            session_context = MentalHealthAIAgent.wait_for_context(session_context_future, "session instructions", "")
+
+        if window is None:
+            window = MentalHealthAIAgent.get_session_id(user_id, chat_id), []
+        session_id, inputs["chat_turns"] = window
+        inputs["past_summaries"] = past_summaries
+        inputs["user_context"] = user_context
+        inputs["session_context"] = session_context
+
+        return inputs, session_id
+
+    @staticmethod
+    def wait_for_context(future: Future, name: str, default):
+        """
+        Waits for a prefetched part of a turn's context until the current deadline, at most CONTEXT_PREFETCH_TIMEOUT.
+        Returns the default if it is not ready in time.
+        """
+        try:
+            return future.result(timeout=bound_timeout(CONTEXT_PREFETCH_TIMEOUT))
+        except TimeoutError:
+            future.cancel()
+            logging.warning(f"Prefetching the {name} of a turn timed out, answering without it")
+            return default
+
+    def save_turn(self, session_id: str, message: str, response: str):
+        """
+        Appends the user's message and the agent's response to the session's history in a single write.
+        """
+        self.get_session_history(session_id).add_messages([
+            HumanMessage(content=message),
+            AIMessage(content=response)
+        ])
+
+    def get_cached_response(self, message: str) -> tuple[list[float] | None, str | None]:
+        """
+        Looks up the response to a self-contained question that does not depend on the user in the semantic response cache.
+        Follow-ups and questions about the user skip the cache.
+
+        Args:
+            message (str): The user's message.
+
+        Returns:
+            tuple: The message's embedding if its response can be cached, and the cached response if there is one.
+        """
+        if not is_shareable_question(message):
+            return None, None
+
+        try:
+            vector = self.embedding_model.embed_query(message)
+        except Exception as e:
+            logging.warning(f"Could not embed message for the response cache: {e}")
+            return None, None
+
+        return vector, response_cache.lookup(vector)
+
+    @staticmethod
+    def cache_response(vector: list[float] | None, inputs: dict, invocation: dict, response: str, user_id: str):
+        """
+        Caches the response to a shareable question, unless it was built with earlier turns of the session,
+        session instructions, the user's summaries or facts, with personal tools, or addresses the user by name.
+        Runs that were cut short or that answered without the results of a tool are not cached either.
+        """
+        if vector is None or invocation.get("stopped") or invocation.get("tool_timed_out"):
+            return
+
+        if any(inputs.get(key) for key in ("session_context", "past_summaries", "user_context")):
+            return
+
+        # The opening greeting is saved with an empty user message, it is not a turn the response could depend on
+        if any(isinstance(turn, HumanMessage) and turn.content for turn in inputs.get("chat_turns", [])):
+            return
+
+        tools_used = {action.tool for action, _ in invocation.get("intermediate_steps", [])}
+        if not tools_used <= SHAREABLE_TOOLS:
+            return
+
+        user_name = get_user_name(user_id)
+        if user_name and user_name.lower() in response.lower():
+            return
+
+        response_cache.store(vector, response)
+
+    @staticmethod
+    def format_response(response) -> str:
+        """
+        Converts the executor's output into a string that can be sent to the client.
+
+        Args:
+            response: The output of the agent executor.
+        """
+        if isinstance(response, dict):
+            response = json.dumps(response)
+        elif not isinstance(response, str):
+            response = str(response)
+
+        return response
+
+
     def run(self, message: str, with_history:bool =True, user_id: str=None, chat_id:int=None, turn_id:int=None) -> str:
         """
         Runs the agent with the given message and context.
@@ -279,44 +649,73 @@ class MentalHealthAIAgent(AIAgent):
             chat_id (int): A unique identifier for the conversation.
             turn_id (int): A unique identifier for the evaluated turn in the conversation.
         """
+        # The cache lookup, context prefetch, LLM and tool calls are bounded by the time left,
+        # and the run ends with a partial answer when it runs out
+        with deadline(AGENT_RUN_TIMEOUT):
+            vector, cached_response = self.get_cached_response(message)
+            if cached_response is not None:
+                self.save_turn(MentalHealthAIAgent.get_session_id(user_id, chat_id), message, cached_response)
+                return cached_response
 
+            inputs, session_id = self.get_invocation_args(message, user_id, chat_id)
 
-        chat_id = MentalHealthAIAgent.get_chat_id(user_id)
+            invocation = self.agent_executor.invoke(inputs)
+        response = MentalHealthAIAgent.format_response(invocation["output"])
+        self.save_turn(session_id, message, response)
+        MentalHealthAIAgent.cache_response(vector, inputs, invocation, response, user_id)
 
-       
-        # TODO: throw error if user_id, chat_id is set to None.
-        session_id = f"{user_id}-{chat_id}"
-       
-       # Retrieve past conversation summaries for the user
-        db_client = MongoDBClient.get_client()
-        db_name = MongoDBClient.get_db_name()
-        db = db_client[db_name]
-        chat_summary_collection = db["chat_summaries"]
-        past_summaries_cursor = chat_summary_collection.find({"user_id": user_id}).sort("chat_id", -1)
-        past_summaries = list(past_summaries_cursor)
-        summaries_text = "\n".join([summary.get("summary_text", "") for summary in past_summaries])
+        return response
 
-        try:
-            invocation = self.agent_executor.invoke(
-            {
-                "input": message,
-                "user_id": user_id,
-                "past_summaries": summaries_text,
-                "agent_scratchpad": []
-            },
-            config={"configurable": {"session_id": session_id}}
-        )
 
-            response = invocation["output"]
+    def stream(self, message: str, user_id: str=None, chat_id:int=None, turn_id:int=None) -> Iterator[dict]:
+        """
+        Runs the agent with the given message and yields its events as they are produced.
 
-            if isinstance(response, dict):
-                response = json.dumps(response)
-            elif not isinstance(response, str):
-                response = str(response)
+        Each event is a dictionary with an `event` name (`token`, `tool_start`, `tool_end`,
+        `final` or `error`) and its `data`. The turn is written to the chat history only
+        once the agent has produced its final message.
 
-            return response
-        except Exception as e:
-            raise
+        Args:
+            message (str): The message to be processed by the agent.
+            user_id (str): A unique identifier for the user.
+            chat_id (int): A unique identifier for the conversation.
+            turn_id (int): A unique identifier for the evaluated turn in the conversation.
+        """
+        event_queue = Queue()
+        config = {"callbacks": [QueueCallbackHandler(event_queue)]}
+
+        # The whole turn runs in the worker, so that the deadline also bounds the cache lookup and context prefetch
+        def invoke_agent():
+            try:
+                with deadline(AGENT_RUN_TIMEOUT):
+                    vector, cached_response = self.get_cached_response(message)
+                    if cached_response is not None:
+                        self.save_turn(MentalHealthAIAgent.get_session_id(user_id, chat_id), message, cached_response)
+                        event_queue.put({"event": "final", "data": cached_response})
+                        return
+
+                    inputs, session_id = self.get_invocation_args(message, user_id, chat_id)
+
+                    invocation = self.agent_executor.invoke(inputs, config=config)
+                response = MentalHealthAIAgent.format_response(invocation["output"])
+                self.save_turn(session_id, message, response)
+                MentalHealthAIAgent.cache_response(vector, inputs, invocation, response, user_id)
+                event_queue.put({"event": "final", "data": response})
+            except Exception as e:
+                logging.error(f"Error while streaming agent response: {e}", exc_info=True)
+                event_queue.put({"event": "error", "data": str(e)})
+
+        worker = Thread(target=invoke_agent, daemon=True)
+        worker.start()
+
+        while True:
+            event = event_queue.get()
+            yield event
+
+            if event["event"] in ("final", "error"):
+                break
+
+        worker.join()
 
 
     def get_initial_greeting(self, user_id:str) -> dict:
@@ -334,29 +733,6 @@ class MentalHealthAIAgent(AIAgent):
         chat_summary_collection = db["chat_summaries"]
         user_journey = user_journey_collection.find_one({"user_id": user_id})
 
-         # Retrieve past conversation summaries for the user
-        past_summaries_cursor = chat_summary_collection.find({"user_id": user_id}).sort("chat_id", -1)
-
-        past_summaries = list(past_summaries_cursor)
-
-        # Combine the past summaries into a single string
-        recent_summaries = past_summaries[:2]
-        summaries_text = "\n".join([summary.get("summary_text", "") for summary in recent_summaries])
-        print(f"Past summaries retrieved:\n{summaries_text}")
-
-        # Include the summaries in the system prompt
-        system_message = self.system_message
-
-        if summaries_text:
-            addendum = f"""
-    Previous Conversations Summary:
-    {summaries_text}
-
-    Please use the above information to continue assisting the user.
-    """
-            system_message.content += addendum
-
-
         now = datetime.now()
         chat_id = int(now.timestamp())
 
@@ -365,8 +741,10 @@ class MentalHealthAIAgent(AIAgent):
                 "chat_id": chat_id,
                 "perceived_mood": "",
                 "summary_text": "",
+                "summarized_message_count": 0,
                 "concerns_progress": []
         })
+        register_chat_session(user_id, chat_id)
 
         # Has user engaged with chatbot before?
         if user_journey is None:
@@ -379,53 +757,192 @@ class MentalHealthAIAgent(AIAgent):
                 "mental_health_concerns": []
             })
 
-            introduction = """
-    This is your first session with the patient. Be polite and introduce yourself in a friendly and inviting manner.
-    In this session, do your best to understand what the user hopes to achieve through your service, and derive a therapy style fitting to their needs.
-    """
-
-            full_system_message = ''.join([system_message.content, introduction])
-            system_message.content = full_system_message
-
-        chat_id = MentalHealthAIAgent.get_chat_id(user_id)
+        # Greetings are precomputed after each session and at login, so the welcome screen does not wait on the LLM
+        if user_id == ANONYMOUS_USER_ID:
+            response = ANONYMOUS_GREETING
+        elif user_journey is None:
+            response = FIRST_SESSION_GREETING
+        else:
+            response = get_user_greeting(user_id) or self.generate_greeting(user_id)
 
-        response = self.run(
-            message="",
-            with_history=True,
-            user_id=user_id,
-            chat_id=chat_id,
-            turn_id=0,
-        )
+        self.save_turn(f"{user_id}-{chat_id}", "", response)
 
         return {
             "message": response,
             "chat_id": chat_id
         }
+
+    def generate_greeting(self, user_id: str) -> str:
+        """
+        Writes the greeting that opens the user's next session with a single LLM call, without tools.
+        It draws on the latest conversation summaries and what is known of the user.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+        """
+        summaries_text = "\n".join(get_recent_digests(user_id) + get_past_summaries(user_id)[:2])
+
+        instructions = """
+        Write the greeting that opens a new session with the user, in one to three sentences.
+        Welcome them back warmly, briefly refer to what you talked about last time if it is relevant, and invite them to share how they are doing.
+        Return only the greeting.
+        """
+
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", self.system_message.content),
+                ("system", "Previous Conversations Summary:\n{past_summaries}"),
+                ("system", "{user_context}"),
+                ("system", instructions),
+            ]
+        )
+
+        chain = prompt | self.llm | StrOutputParser()
+        return chain.invoke({
+            "past_summaries": summaries_text or "None",
+            "user_context": MentalHealthAIAgent.get_user_context(user_id),
+        })
+
+    def precompute_greeting(self, user_id: str):
+        """
+        Generates and stores the greeting served at the start of the user's next session.
+        Anonymous and first-time users are greeted with a template instead.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+        """
+        if user_id == ANONYMOUS_USER_ID:
+            return
+
+        db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+        if db["user_journeys"].find_one({"user_id": user_id}, {"_id": 1}) is None:
+            return
+
+        save_user_greeting(user_id, self.generate_greeting(user_id))
         
         
 
-    def get_summary_from_chat_history(self, user_id, chat_id):
-        history: BaseChatMessageHistory = self.get_session_history(f"{user_id}-{chat_id}")
+    @staticmethod
+    def get_transcript_chunks(messages: list[BaseMessage], chunk_token_limit: int = SUMMARY_CHUNK_TOKEN_LIMIT, token_limit: int = SUMMARY_TRANSCRIPT_TOKEN_LIMIT) -> list[str]:
+        """
+        Formats messages as a transcript, keeping the newest lines within the token limit,
+        and splits it into chunks that each fit in the chunk token limit.
+
+        Args:
+            messages (list[BaseMessage]): The chat messages, oldest first.
+            chunk_token_limit (int): The maximum number of tokens in a chunk.
+            token_limit (int): The maximum number of tokens in the whole transcript.
+        """
+        lines = []
+        used_tokens = 0
+        for msg in reversed(messages):
+            speaker = "User" if isinstance(msg, HumanMessage) else AGENT_NAME
+            line = f"{speaker}: {msg.content}"
+            line_tokens = count_tokens(f"{speaker}: ") + count_message_tokens(msg)
+            if used_tokens + line_tokens > token_limit:
+                break
+            lines.append((line, line_tokens))
+            used_tokens += line_tokens
+        lines.reverse()
+
+        chunks = []
+        chunk_lines = []
+        chunk_tokens = 0
+        for line, line_tokens in lines:
+            if chunk_lines and chunk_tokens + line_tokens > chunk_token_limit:
+                chunks.append("\n".join(chunk_lines))
+                chunk_lines = []
+                chunk_tokens = 0
+            chunk_lines.append(line)
+            chunk_tokens += line_tokens
+        if chunk_lines:
+            chunks.append("\n".join(chunk_lines))
+
+        return chunks
+
+    def get_summary_from_messages(self, messages: list[BaseMessage]) -> str:
+        """
+        Summarizes a chat session in a single LLM call. Very long sessions are split into chunks
+        that are summarized concurrently, then combined into one summary.
+
+        Args:
+            messages (list[BaseMessage]): The chat messages, oldest first.
+        """
+        chunks = MentalHealthAIAgent.get_transcript_chunks(messages)
+        if not chunks:
+            return ""
+
+        instructions = """
+        Summarize the following part of a therapy session between the user and the AI.
+        Keep the user's concerns, feelings, important life events, and any advice, goals or exercises that were agreed on.
+        Be concise and write in the third person.
+        """
+
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", instructions),
+                ("human", "{transcript}"),
+            ]
+        )
 
-        memory = ConversationSummaryMemory(
-            llm=self.llm,
-            chat_memory=history,
-            return_messages=True
+        chain = prompt | self.llm | StrOutputParser()
+        partial_summaries = chain.batch(
+            [{"transcript": chunk} for chunk in chunks],
+            config={"max_concurrency": SUMMARY_MAX_CONCURRENCY}
         )
 
-        
-        for msg in asyncio.run(history.aget_messages()):
-            if isinstance(msg, HumanMessage):
-                memory.save_context({"input": msg.content}, {})
-            else:
-                memory.save_context({}, {"output": msg.content})
-
-        # Retrieve the summary
-        summary = memory.load_memory_variables({}).get('history', '')
+        if len(partial_summaries) == 1:
+            return partial_summaries[0]
+
+        reduce_instructions = """
+        You are given summaries of consecutive parts of the same therapy session, in order.
+        Combine them into a single concise summary of the whole session, written in the third person.
+        """
+
+        reduce_prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", reduce_instructions),
+                ("human", "{summaries}"),
+            ]
+        )
+
+        reduce_chain = reduce_prompt | self.llm | StrOutputParser()
+        return reduce_chain.invoke({"summaries": "\n\n".join(partial_summaries)})
+
+    def get_summary_from_chat_history(self, user_id, chat_id):
+        messages = self.get_chat_messages(user_id, [chat_id])[0]
+
+        summary = self.get_summary_from_messages(messages)
         print(f"Generated summary: {summary}")
         return summary
 
 
+    def get_digest_from_summaries(self, summaries: list[str]) -> str:
+        """
+        Combines several chat summaries, or digests, into a single digest.
+
+        Args:
+            summaries (list[str]): The summaries to combine, oldest first.
+        """
+        instructions = """
+        You are given summaries of consecutive therapy sessions with the same user, oldest first.
+        Combine them into a single concise summary of the whole period.
+        Keep the user's recurring concerns, their progress, notable life events and any therapy plan or goals.
+        Leave out small talk and details that did not matter beyond a single session.
+        """
+
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", instructions),
+                ("human", "{summaries}"),
+            ]
+        )
+
+        chain = prompt | self.llm | StrOutputParser()
+        digest = chain.invoke({"summaries": "\n\n".join(summaries)})
+
+        return digest
+
 
     def perform_final_processes(self, user_id, chat_id):
         db_client = MongoDBClient.get_client()
@@ -434,14 +951,29 @@ class MentalHealthAIAgent(AIAgent):
 
         chat_summary_collection = db["chat_summaries"]
 
-        mood = self.get_user_mood(user_id, chat_id)
-        summary = self.get_summary_from_chat_history(user_id, chat_id)
+        # Mood detection and summarization are independent, so run them concurrently.
+        # The summary was kept up to date during the chat, so only the last turns are left to fold in.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            mood_future = executor.submit(self.get_user_mood, user_id, chat_id)
+            summary_future = executor.submit(self.exec_update_step, user_id, chat_id, min_new_turns=0)
+            mood = mood_future.result()
+            summary = summary_future.result()
 
         # Update the chat summary
         result = chat_summary_collection.update_one(
             {"user_id": user_id, "chat_id": int(chat_id)}, 
-            {"$set": {"perceived_mood": mood, "summary_text": summary}}
+            {"$set": {"perceived_mood": mood}}
         )
 
+        # Embed the stored summary so it can be retrieved by relevance in later chats.
+        # The vector is only saved if the summary was not rewritten while it was being embedded.
+        if summary:
+            summary_vector = self.embedding_model.embed_query(summary)
+            chat_summary_collection.update_one(
+                {"user_id": user_id, "chat_id": int(chat_id), "summary_text": compress_text(summary, "chat_summaries")},
+                {"$set": {"summary_vector": summary_vector}}
+            )
+        invalidate_summary_cache(user_id)
+
         print(result)
         pass
\ No newline at end of file
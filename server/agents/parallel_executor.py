@@ -0,0 +1,155 @@
+"""
+This module defines an agent executor that runs the tool calls the model makes in a single step concurrently,
+and that answers with its best partial answer once its iteration budget or the request's deadline runs out.
+"""
+
+# -- Standard libraries --
+import contextvars
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+# -- 3rd Party libraries --
+## Langchain
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.callbacks import CallbackManagerForChainRun
+from langchain_core.tools import BaseTool
+
+# -- Custom modules --
+from utils.consts import TOOL_CALL_TIMEOUT, TOOL_CALL_WORKERS, LLM_MIN_TIMEOUT, AGENT_TIMEOUT_RESPONSE
+from utils.deadline import bound_timeout, deadline, get_remaining_time
+
+logger = logging.getLogger(__name__)
+
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_CALL_WORKERS, thread_name_prefix="tool-call")
+
+# Whether the current run ran out of iterations or time, set when the executor's loop stops
+_stopped: contextvars.ContextVar[bool] = contextvars.ContextVar("agent_stopped", default=False)
+# Whether a tool call of the current run timed out and was answered with a timeout message
+_tool_timed_out: contextvars.ContextVar[bool] = contextvars.ContextVar("agent_tool_timed_out", default=False)
+
+
+class ParallelAgentExecutor(AgentExecutor):
+    """
+    An agent executor that dispatches every tool call of a step to a shared thread pool as soon as the model emits it,
+    then waits for all of them, so a step takes about as long as its slowest tool rather than the sum of them.
+    Observations are returned in the order the model made the calls.
+    A tool that does not answer within `tool_timeout` seconds, or before the request's deadline,
+    gets a timeout message as its observation.
+
+    When the run exceeds `max_iterations` or its deadline, or an LLM call fails because the deadline passed,
+    the run ends with the last text the model wrote instead of a generic stop message.
+    The output's `stopped` and `tool_timed_out` flags tell whether the run was cut short or answered without
+    the results of a tool, in which case its answer should not be reused.
+    """
+
+    tool_timeout: float = TOOL_CALL_TIMEOUT
+
+    def _call(self, inputs: Dict[str, str], run_manager: Optional[CallbackManagerForChainRun] = None) -> Dict[str, Any]:
+        stopped_token = _stopped.set(False)
+        tool_timed_out_token = _tool_timed_out.set(False)
+        try:
+            return super()._call(inputs, run_manager)
+        finally:
+            _stopped.reset(stopped_token)
+            _tool_timed_out.reset(tool_timed_out_token)
+
+    def _should_continue(self, iterations: int, time_elapsed: float) -> bool:
+        should_continue = super()._should_continue(iterations, time_elapsed) and get_remaining_time() != 0
+        if not should_continue:
+            logger.warning(f"Agent run stopped after {iterations} iterations and {time_elapsed:.1f} seconds")
+            _stopped.set(True)
+        return should_continue
+
+    def _return(
+        self,
+        output: AgentFinish,
+        intermediate_steps: list,
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        if _stopped.get():
+            output = AgentFinish({"output": ParallelAgentExecutor.get_partial_answer(intermediate_steps)}, "")
+        return {
+            **super()._return(output, intermediate_steps, run_manager),
+            "stopped": _stopped.get(),
+            "tool_timed_out": _tool_timed_out.get(),
+        }
+
+    @staticmethod
+    def get_partial_answer(intermediate_steps: list) -> str:
+        """
+        Returns the last text the model wrote alongside its tool calls, or an apology if it wrote none.
+        """
+        for action, _ in reversed(intermediate_steps):
+            for message in reversed(getattr(action, "message_log", [])):
+                if isinstance(message.content, str) and message.content.strip():
+                    return message.content
+        return AGENT_TIMEOUT_RESPONSE
+
+    def _perform_agent_action(
+        self,
+        name_to_tool_map: Dict[str, BaseTool],
+        color_mapping: Dict[str, str],
+        agent_action: AgentAction,
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> AgentStep:
+        # Each call runs in a copy of the current context, so callbacks and tracing still see the parent run.
+        # The copy carries a deadline matching the step's wait, so searches give up when they are no longer awaited.
+        with deadline(self.tool_timeout):
+            context = contextvars.copy_context()
+        future = _tool_executor.submit(
+            context.run, super()._perform_agent_action, name_to_tool_map, color_mapping, agent_action, run_manager)
+        return AgentStep(action=agent_action, observation=future)
+
+    def _iter_next_step(
+        self,
+        name_to_tool_map: Dict[str, BaseTool],
+        color_mapping: Dict[str, str],
+        inputs: Dict[str, str],
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Iterator[Union[AgentFinish, AgentAction, AgentStep]]:
+        # Tool calls wait from the moment the first one is dispatched, so the time spent planning is not taken from them
+        wait_until = None
+        pending_steps = []
+
+        # The base class performs the actions lazily, one per item consumed, so draining it starts every call
+        try:
+            for output in super()._iter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+                if isinstance(output, AgentStep) and isinstance(output.observation, Future):
+                    if wait_until is None:
+                        wait_until = time.monotonic() + bound_timeout(self.tool_timeout)
+                    pending_steps.append(output)
+                else:
+                    yield output
+        except Exception as e:
+            # LLM calls time out at the deadline, so a failure that close to it ends the run rather than the request
+            remaining = get_remaining_time()
+            if remaining is None or remaining > LLM_MIN_TIMEOUT or pending_steps:
+                raise
+            logger.warning(f"Agent step failed at the run's deadline: {e}")
+            _stopped.set(True)
+            yield AgentFinish({"output": ParallelAgentExecutor.get_partial_answer(intermediate_steps)}, "")
+            return
+
+        for step in pending_steps:
+            yield self.wait_for_step(step, wait_until)
+
+    def wait_for_step(self, step: AgentStep, wait_until: float) -> AgentStep:
+        """
+        Waits until the given time for a dispatched tool call and returns its step, cancelling the call if it timed out.
+        Errors raised by the tool are propagated, as they would be if the call ran in this thread.
+        """
+        try:
+            return step.observation.result(timeout=max(wait_until - time.monotonic(), 0))
+        except TimeoutError:
+            # A call still waiting for a thread gives it up, a running one stops at the deadline it was given
+            step.observation.cancel()
+            _tool_timed_out.set(True)
+            logger.warning(f"Tool {step.action.tool} did not answer within {self.tool_timeout} seconds")
+            return AgentStep(
+                action=step.action,
+                observation=f"The {step.action.tool} tool did not answer in time. Answer without its results."
+            )
@@ -0,0 +1,52 @@
+"""
+This module builds the prompt of the mental health agent.
+
+Every prompt starts with a static prefix, the system message followed by the instructions of the agent's tools,
+which is byte-for-byte identical across turns and users of the same agent configuration,
+so that the provider can reuse its cached processing of the tool schemas and that prefix.
+All per-user and per-turn content comes after it.
+"""
+
+# -- Standard libraries --
+from functools import lru_cache
+
+# -- 3rd Party libraries --
+## Langchain
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+# -- Custom modules --
+from utils.consts import TOOL_INSTRUCTIONS
+
+
+def get_static_prefix(system_message: str, tool_names: tuple[str, ...]) -> str:
+    """
+    Returns the system message followed by the instructions of the given tools, in a fixed order.
+    """
+    instructions = [instruction for name, instruction in TOOL_INSTRUCTIONS.items() if name in tool_names]
+    return "\n".join([system_message.strip(), *instructions])
+
+
+@lru_cache(maxsize=None)
+def build_agent_prompt(system_message: str, tool_names: tuple[str, ...]) -> ChatPromptTemplate:
+    """
+    Compiles the agent prompt of a configuration once, and returns the same template on later calls.
+
+    Args:
+        system_message (str): The agent's system message.
+        tool_names (tuple[str, ...]): The names of the tools the agent was given, sorted.
+
+    Returns:
+        ChatPromptTemplate: A prompt expecting past_summaries, session_context, user_context, user_id,
+        chat_turns, input and agent_scratchpad.
+    """
+    return ChatPromptTemplate.from_messages(
+        [
+            # A message rather than a template, so its content is sent as is and never formatted
+            SystemMessage(content=get_static_prefix(system_message, tool_names)),
+            ("system", "{past_summaries}\n\n{session_context}\n\n{user_context}\n\nuser_id:{user_id}"),
+            MessagesPlaceholder(variable_name="chat_turns"),
+            ("human", "{input}"),
+            MessagesPlaceholder(variable_name="agent_scratchpad"),
+        ]
+    )
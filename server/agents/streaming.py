@@ -0,0 +1,48 @@
+"""
+This module defines the callback handler used to stream agent events to clients.
+"""
+
+# -- Standard libraries --
+from queue import Queue
+from typing import Any, AsyncIterator, Iterator, TypeVar
+from uuid import UUID
+
+# -- 3rd Party libraries --
+## Langchain
+from langchain_core.agents import AgentAction
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers._streaming import _StreamingCallbackHandler
+
+T = TypeVar("T")
+
+
+class QueueCallbackHandler(BaseCallbackHandler, _StreamingCallbackHandler):
+    """
+    A callback handler that pushes LLM tokens and tool calls onto a queue as they happen,
+    so that another thread can forward them to the client.
+
+    Chat models only call the streaming API when a streaming handler is attached,
+    so runs with this handler stream their tokens while other runs of the same model do not.
+    """
+
+    def __init__(self, event_queue: Queue):
+        self.event_queue = event_queue
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        # Tool-call chunks carry no text content, only forward tokens meant for the user
+        if token:
+            self.event_queue.put({"event": "token", "data": token})
+
+    def on_agent_action(self, action: AgentAction, **kwargs: Any) -> None:
+        self.event_queue.put({"event": "tool_start", "data": {"tool": action.tool}})
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        # Tool outputs may hold profile data, so only the tool name is sent
+        self.event_queue.put({"event": "tool_end", "data": {"tool": kwargs.get("name")}})
+
+    def tap_output_iter(self, run_id: UUID, output: Iterator[T]) -> Iterator[T]:
+        # Tokens are forwarded by on_llm_new_token, the output itself passes through unchanged
+        return output
+
+    def tap_output_aiter(self, run_id: UUID, output: AsyncIterator[T]) -> AsyncIterator[T]:
+        return output
@@ -0,0 +1,72 @@
+"""
+This module defines a keyword router that picks the tools relevant to a user's message,
+so that the agent answering it is only given those tools and their instructions.
+"""
+
+# -- Standard libraries --
+import re
+
+# Tools given to the agent whatever the message
+ALWAYS_ON_TOOLS = ["agent_facts"]
+
+# Messages that match a pattern get the corresponding tool
+TOOL_PATTERNS = {
+    "generate_suggestions": re.compile(
+        r"\b(feel\w*|mood|stress\w*|anxi\w*|sad|depress\w*|lonely|angry|overwhelm\w*|tired|sleep\w*|cope|coping|"
+        r"suggest\w*|advice|activit\w*|exercise\w*|relax\w*|calm\w*|what (can|should) i do)\b",
+        re.IGNORECASE
+    ),
+    "web_search_youtube": re.compile(
+        r"\b(youtube|videos?|watch|music|songs?|podcasts?|guided meditations?)\b",
+        re.IGNORECASE
+    ),
+    "location_search_gplaces": re.compile(
+        r"\b(near me|nearby|near\w* (my|here)|closest|locations?|address|directions|clinics?|hospitals?|"
+        r"therapists? (in|near|around)|where (can|do) i (find|get|go))\b",
+        re.IGNORECASE
+    ),
+    "user_profile_retrieval": re.compile(
+        r"\b(my (profile|name|age|details|info\w*|account)|about me|who am i|know about me)\b",
+        re.IGNORECASE
+    ),
+    "user_journey_retrieval": re.compile(
+        r"\b(my (journey|progress|history|goals?)|how (have|was) i been|last (time|week|month|session)|so far|improv\w*)\b",
+        re.IGNORECASE
+    ),
+}
+
+# Messages asking for outside information get one web search tool, preferably the one they name
+WEB_SEARCH_PATTERN = re.compile(
+    r"\b(search\w*|look (it |this )?up|google|bing|tavily|find|articles?|research|studies|study|news|latest|"
+    r"resources?|websites?|links?|information|facts?|what is|what are|how (do|does|to))\b",
+    re.IGNORECASE
+)
+WEB_SEARCH_TOOLS = {
+    "web_search_tavily": re.compile(r"\btavily\b", re.IGNORECASE),
+    "web_search_google": re.compile(r"\bgoogle\b", re.IGNORECASE),
+    "web_search_bing": re.compile(r"\bbing\b", re.IGNORECASE),
+}
+
+
+def select_tools(message: str, tool_names: list[str]) -> list[str]:
+    """
+    Returns the subset of the available tools that is relevant to a message, in a stable order,
+    so that messages needing the same tools share the same agent.
+
+    Args:
+        message (str): The user's message.
+        tool_names (list[str]): The names of the tools the agent may use.
+    """
+    message = message or ""
+    selected = {name for name in ALWAYS_ON_TOOLS if name in tool_names}
+    selected.update(
+        name for name, pattern in TOOL_PATTERNS.items()
+        if name in tool_names and pattern.search(message)
+    )
+
+    if WEB_SEARCH_PATTERN.search(message):
+        search_tools = [name for name in WEB_SEARCH_TOOLS if name in tool_names]
+        named_tools = [name for name in search_tools if WEB_SEARCH_TOOLS[name].search(message)]
+        selected.update(named_tools or search_tools[:1])
+
+    return sorted(selected)
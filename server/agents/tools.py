@@ -1,10 +1,9 @@
 import os
-from langchain_community.tools.tavily_search import TavilySearchResults
 from utils.docs import format_docs
 from services.db.user import get_user_profile_by_user_id
 from services.db.user_journey import get_user_journey_by_user_id
 from langchain.tools import Tool
-from utils.agents import get_google_search_results, get_bing_search_results, get_youtube_search_results, generate_suggestions
+from utils.agents import get_google_search_results, get_bing_search_results, get_youtube_search_results, get_tavily_search_results, generate_suggestions
 from langchain_google_community import GooglePlacesTool
 
 
@@ -22,7 +21,6 @@ def vector_store_chain_factory(collection_name) -> callable:
 
 toolbox = {
     "community": {
-        "web_search_tavily": TavilySearchResults(),
         "location_search_gplaces": GooglePlacesTool(),
     },
     "custom": {
@@ -49,6 +47,12 @@ toolbox = {
             "retriever": False,
             "structured": True
         },
+        "web_search_tavily": {
+            "func": get_tavily_search_results,
+            "description": "Uses Tavily Search to fetch search results for a given query.",
+            "retriever": False,
+            "structured": True
+        },
         "web_search_youtube": {
             "func": get_youtube_search_results,
             "description": "Uses YouTube Search to fetch search results for a given query.",
@@ -8,6 +8,7 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from services.scheduler_main import NotificationScheduler
+from services.summary_compaction import SummaryCompactionScheduler
 from models.subscription import db as sub_db
 from services.db.agent_facts import load_agent_facts_to_db
 from config.config import Config
@@ -64,6 +65,11 @@ def run_app():
     notification_thread = Thread(target=scheduler.run_scheduler)
     notification_thread.start()
 
+    # Create and start the chat summary compaction job
+    compaction_scheduler = SummaryCompactionScheduler()
+    compaction_thread = Thread(target=compaction_scheduler.run_scheduler, daemon=True)
+    compaction_thread.start()
+
     @app.route("/test-notification")
     def test_notification():
         # Use actual values or test values for user_id and check_in_id
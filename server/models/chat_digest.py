@@ -0,0 +1,67 @@
+"""
+This model represents a digest, that is, a summary of the chat summaries
+a user had within a week, or of the weekly digests within a month.
+"""
+
+from datetime import datetime
+from enum import Enum
+from pydantic import BaseModel, Field
+from services.azure_mongodb import MongoDBClient
+
+
+class DigestPeriod(str, Enum):
+    WEEK = "week"
+    MONTH = "month"
+
+
+class ChatDigest(BaseModel):
+    user_id: str
+    period: DigestPeriod
+    period_start: int  # Unix timestamp of the start of the week or month
+    start_chat_id: int  # Oldest chat covered by the digest
+    end_chat_id: int  # Newest chat covered by the digest
+    source_count: int  # Number of summaries or digests rolled into the digest
+    summary_text: str = ""
+    compacted: bool = False  # Set once the digest is rolled into a larger one
+    created_at: datetime = Field(default_factory=datetime.now)
+
+    @staticmethod
+    def get_digest_id(user_id: str, period: DigestPeriod, period_start: int) -> str:
+        """
+        Builds a deterministic ID, so that concurrent compaction jobs write to the same digest.
+        """
+        return f"{user_id}-{period.value}-{period_start}"
+
+    @classmethod
+    def delete_all_user_digests(cls, user_id):
+        db_client = MongoDBClient.get_client()
+        db = db_client[MongoDBClient.get_db_name()]
+
+        return db["chat_digests"].delete_many({"user_id": user_id})
+
+    @classmethod
+    def delete_user_digests_in_range(cls, user_id, start_chat_id, end_chat_id):
+        """
+        Deletes the digests that overlap the given chat ID range, and releases their sources
+        so that the remaining chats are compacted again on the next run.
+        """
+        db_client = MongoDBClient.get_client()
+        db = db_client[MongoDBClient.get_db_name()]
+
+        overlapping = db["chat_digests"].find({
+            "user_id": user_id,
+            "start_chat_id": {"$lte": end_chat_id},
+            "end_chat_id": {"$gte": start_chat_id}
+        }, {"_id": 1})
+        digest_ids = [digest["_id"] for digest in overlapping]
+
+        if not digest_ids:
+            return None
+
+        for collection_name in ("chat_summaries", "chat_digests"):
+            db[collection_name].update_many(
+                {"user_id": user_id, "digest_id": {"$in": digest_ids}},
+                {"$set": {"compacted": False}, "$unset": {"digest_id": ""}}
+            )
+
+        return db["chat_digests"].delete_many({"_id": {"$in": digest_ids}})
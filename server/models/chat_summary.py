@@ -6,6 +6,9 @@ with the chatbot within a session.
 from datetime import datetime
 from pydantic import BaseModel
 from services.azure_mongodb import MongoDBClient
+from services.db.chat_summary import invalidate_summary_cache
+from services.db.chat_session import invalidate_chat_sessions
+from models.chat_digest import ChatDigest
 from pymongo import MongoClient
 
 class ConcernProgress(BaseModel):
@@ -53,6 +56,9 @@ class ChatSummary(BaseModel):
 
         # Delete all chat summaries for the given user
         result = chat_summary_collection.delete_many({"user_id": user_id})
+        ChatDigest.delete_all_user_digests(user_id)
+        invalidate_summary_cache(user_id)
+        invalidate_chat_sessions(user_id)
         return result  # This will return a DeleteResult object which includes the count of deleted documents
     
     @classmethod
@@ -75,4 +81,7 @@ class ChatSummary(BaseModel):
             }
         })
         print("Deleted count:", result.deleted_count)
+        ChatDigest.delete_user_digests_in_range(user_id, start_chat_id, end_chat_id)
+        invalidate_summary_cache(user_id)
+        invalidate_chat_sessions(user_id)
         return result  # This will return a DeleteResult object which includes the count of deleted documents
\ No newline at end of file
@@ -1,10 +1,14 @@
 import logging
 
 from flask import jsonify
-from flask import Blueprint, request
+from flask import Blueprint, request, Response, stream_with_context
 import json
 from services.speech_service import speech_to_text
 from agents.mental_health_agent import MentalHealthAIAgent
+from agents.agent_registry import AgentRegistry
+from agents.tool_router import select_tools
+from services.finalize_jobs import submit_finalize_job, get_finalize_job, submit_summary_update
+from services.db.chat_session import is_valid_chat_session
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,9 +16,23 @@ logger = logging.getLogger(__name__)
 
 ai_routes = Blueprint("ai", __name__)
 
+# Tools the mental health agent may use, narrowed down per message
+MENTAL_HEALTH_TOOLS = [
+    "generate_suggestions",
+    "web_search_youtube",
+    "web_search_google",
+    "web_search_tavily",
+    "location_search_gplaces",
+    "web_search_bing",
+    "user_profile_retrieval",
+    "agent_facts",
+    "user_journey_retrieval",
+]
+
 @ai_routes.post("/ai/mental_health/welcome/<user_id>")
 def get_mental_health_agent_welcome(user_id):
-    agent = MentalHealthAIAgent(tool_names=["generate_suggestions","web_search_youtube","web_search_tavily","wiki_search","web_search_bing","location_search_gplaces", "web_search_google", "user_profile_retrieval", "agent_facts"])
+    # Greetings are precomputed or templated, so the welcome screen does not need an agent with tools
+    agent = AgentRegistry.get_agent(MentalHealthAIAgent)
 
     response = agent.get_initial_greeting(
                                     user_id=user_id
@@ -27,27 +45,37 @@ def get_mental_health_agent_welcome(user_id):
     return jsonify(response), 200
 
 
+def validate_chat_session(user_id, chat_id):
+    """
+    Returns an error response if the chat ID is malformed or does not belong to the user, None otherwise.
+    """
+    if not str(chat_id).isdigit():
+        return jsonify({"error": "Invalid chat ID"}), 400
+
+    if not is_valid_chat_session(user_id, int(chat_id)):
+        return jsonify({"error": "Chat session not found"}), 404
+
+    return None
+
+
 @ai_routes.post("/ai/mental_health/<user_id>/<chat_id>")
 def run_mental_health_agent(user_id, chat_id):
     body = request.get_json()
     if not body:
         return jsonify({"error": "No data provided"}), 400
+
+    session_error = validate_chat_session(user_id, chat_id)
+    if session_error:
+        return session_error
     
     prompt = body.get("prompt")
     turn_id = body.get("turn_id")
 
-    agent = MentalHealthAIAgent(
-        tool_names=[
-            "generate_suggestions",
-            "web_search_youtube",
-            "web_search_google",
-            "web_search_tavily",
-            "location_search_gplaces",
-            "web_search_bing",
-            "user_profile_retrieval",
-            "agent_facts",
-            "user_journey_retrieval",
-        ]
+    # Each message only gets the tools relevant to it, and each tool subset has its own executor
+    agent = AgentRegistry.get_agent(
+        MentalHealthAIAgent,
+        tool_names=select_tools(prompt, MENTAL_HEALTH_TOOLS),
+        available_tools=MENTAL_HEALTH_TOOLS
     )
 
     try:
@@ -60,6 +88,9 @@ def run_mental_health_agent(user_id, chat_id):
                                 turn_id=turn_id + 1, 
                             )
 
+        # Keep the chat's rolling summary up to date without delaying the response
+        submit_summary_update(user_id, int(chat_id))
+
         return jsonify(response), 200
     except json.JSONDecodeError as e:
         logger.error(f"JSON parsing error: {str(e)}")
@@ -69,21 +100,87 @@ def run_mental_health_agent(user_id, chat_id):
         return jsonify({"error": str(e)}), 500
 
 
+def format_sse(event: str, data) -> str:
+    """
+    Formats an event as a Server-Sent Events message.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@ai_routes.post("/ai/mental_health/stream/<user_id>/<chat_id>")
+def stream_mental_health_agent(user_id, chat_id):
+    body = request.get_json()
+    if not body:
+        return jsonify({"error": "No data provided"}), 400
+
+    session_error = validate_chat_session(user_id, chat_id)
+    if session_error:
+        return session_error
+    
+    prompt = body.get("prompt")
+    turn_id = body.get("turn_id")
+
+    # Each message only gets the tools relevant to it, and each tool subset has its own executor
+    agent = AgentRegistry.get_agent(
+        MentalHealthAIAgent,
+        tool_names=select_tools(prompt, MENTAL_HEALTH_TOOLS),
+        available_tools=MENTAL_HEALTH_TOOLS
+    )
+
+    def generate():
+        try:
+            for event in agent.stream(
+                                    message=prompt,
+                                    user_id=user_id,
+                                    chat_id=int(chat_id),
+                                    turn_id=turn_id + 1,
+                                ):
+                if event["event"] == "final":
+                    # The turn is saved by now, keep the chat's rolling summary up to date
+                    submit_summary_update(user_id, int(chat_id))
+
+                yield format_sse(event["event"], event["data"])
+        except Exception as e:
+            logger.error(f"Unexpected error while streaming: {str(e)}")
+            yield format_sse("error", str(e))
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Prevent reverse proxies from buffering the stream
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @ai_routes.patch("/ai/mental_health/finalize/<user_id>/<chat_id>")
 def set_mental_health_end_state(user_id, chat_id):
+    session_error = validate_chat_session(user_id, chat_id)
+    if session_error:
+        return session_error
+
     try:
         logger.info(f"Finalizing chat {chat_id} for user {user_id}")
-        agent = MentalHealthAIAgent(tool_names=["generate_suggestions","web_search_youtube","web_search_tavily","web_search_bing","location_search_gplaces", "web_search_google", "user_profile_retrieval", "agent_facts"])
 
-        agent.perform_final_processes(user_id, chat_id)
+        # Mood detection and summarization run in the background, the client can poll the job's status
+        job = submit_finalize_job(user_id, int(chat_id))
 
-        # Potentially update the database or perform other cleanup operations
-        # For now, let's assume it's a simple response:
-        return jsonify({"message": "Chat session finalized successfully"}), 200
+        return jsonify({"message": "Chat session finalization queued", **job}), 202
 
     except Exception as e:
         logger.error(f"Error during finalizing chat: {e}", exc_info=True)
         return jsonify({"error": "Failed to finalize chat"}), 500
+
+
+@ai_routes.get("/ai/mental_health/finalize/jobs/<job_id>")
+def get_mental_health_end_state(job_id):
+    job = get_finalize_job(job_id)
+    if job is None:
+        return jsonify({"error": "Finalization job not found"}), 404
+
+    return jsonify(job), 200
     
 
 @ai_routes.post("/ai/mental_health/voice-to-text")
@@ -3,7 +3,6 @@ from bson import json_util
 import json
 import csv
 import io
-import asyncio
 import os
 from dotenv import load_dotenv
 from flask import Blueprint, request, jsonify, current_app,send_file
@@ -18,6 +17,8 @@ from models.user import User as UserModel
 from models.chat_summary import ChatSummary
 from services.db import mood_log
 from agents.mental_health_agent import MentalHealthAIAgent, HumanMessage
+from agents.agent_registry import AgentRegistry
+from services.finalize_jobs import submit_greeting_update
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 from flask_mail import Message, Mail
 
@@ -116,6 +117,8 @@ def login():
         user = UserModel.find_by_username(username)  # You need to implement this method in your User model
         if user and check_password_hash(user.password, password):
             access_token = create_access_token(identity=str(user.id), expires_delta=timedelta(hours=72))
+            # Prepare the greeting of the user's next session while they navigate to the chat
+            submit_greeting_update(str(user.id))
             return jsonify(access_token=access_token, userId=str(user.id)), 200
         else:
             return jsonify({"msg": "Bad username or password"}), 401
@@ -306,18 +309,15 @@ def download_chat_logs():
         headers = ["Chat ID","Timestamp", "Content", "Source"]
         csv_writer.writerow(headers)
 
-        for chat_id in chat_ids:
-            session_id = f"{current_user}-{chat_id}"
-            logging.info(f"Downloading chat logs for session {session_id}")
-            agent = MentalHealthAIAgent()
-            chat_logs = agent.get_session_history(session_id)
+        agent = AgentRegistry.get_agent(MentalHealthAIAgent)
+        # Fetch the histories of all the sessions concurrently
+        chat_logs = agent.get_chat_messages(current_user, chat_ids)
 
-            if not chat_logs or not hasattr(chat_logs, 'aget_messages'):
-                logging.warning(f"No chat logs available for session {session_id}")
+        for chat_id, chat_log_entries in zip(chat_ids, chat_logs):
+            if not chat_log_entries:
+                logging.warning(f"No chat logs available for session {current_user}-{chat_id}")
                 continue
 
-            chat_log_entries = asyncio.run(chat_logs.aget_messages())
-
             for log in chat_log_entries:
                 content = getattr(log, 'content', 'No Content Available')
                 message_type = getattr(log, 'type', 'Unknown Type')
@@ -431,18 +431,16 @@ def download_chat_logs_in_range():
         headers = ["Chat ID", "Timestamp", "Content", "Source"]
         csv_writer.writerow(headers)
 
-        agent = MentalHealthAIAgent()
-        for chat in chat_ids:
-            session_id = f"{current_user}-{chat['chat_id']}"
-            logging.info(f"Downloading chat logs for session {session_id}")
-            chat_logs = agent.get_session_history(session_id)
+        chats = list(chat_ids)
+        agent = AgentRegistry.get_agent(MentalHealthAIAgent)
+        # Fetch the histories of all the sessions concurrently
+        chat_logs = agent.get_chat_messages(current_user, [chat['chat_id'] for chat in chats])
 
-            if not chat_logs or not hasattr(chat_logs, 'aget_messages'):
-                logging.warning(f"No chat logs available for session {session_id}")
+        for chat, chat_log_entries in zip(chats, chat_logs):
+            if not chat_log_entries:
+                logging.warning(f"No chat logs available for session {current_user}-{chat['chat_id']}")
                 continue
 
-            chat_log_entries = asyncio.run(chat_logs.aget_messages())
-
             for log in chat_log_entries:
                 content = getattr(log, 'content', 'No Content Available')
                 message_type = getattr(log, 'type', 'Unknown Type')
@@ -1,8 +1,99 @@
 import os
+import time
+import logging
+from typing import Any, Iterator, List, Optional
+
+import openai
 from dotenv import load_dotenv
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 
-from utils.consts import CONTEXT_LENGTH_LIMIT
+from utils.consts import CONTEXT_LENGTH_LIMIT, LLM_REQUEST_TIMEOUT, LLM_MAX_RETRIES, LLM_MIN_TIMEOUT, LLM_RETRY_BACKOFF
+from utils.deadline import bound_timeout, get_remaining_time
+
+logger = logging.getLogger(__name__)
+
+# Errors the openai client retries by default: timeouts, connection errors, lock timeouts, rate limits and server errors
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.ConflictError, openai.RateLimitError, openai.InternalServerError)
+
+
+class DeadlineAzureChatOpenAI(AzureChatOpenAI):
+    """
+    An Azure OpenAI chat model whose requests time out no later than the deadline of the current request.
+
+    Failed requests are retried here rather than by the openai client, which would reuse the first attempt's timeout.
+    Each attempt's timeout is bounded by the time left, and a request is only retried if that leaves time for it.
+    """
+
+    request_retries: int = LLM_MAX_RETRIES
+
+    def _get_request_payload(self, input_, *, stop=None, **kwargs) -> dict:
+        # Every attempt, including retries, gets at least a short timeout so that it can fail cleanly
+        kwargs.setdefault("timeout", max(bound_timeout(LLM_REQUEST_TIMEOUT), LLM_MIN_TIMEOUT))
+        return super()._get_request_payload(input_, stop=stop, **kwargs)
+
+    def get_retry_delay(self, attempt: int) -> float | None:
+        """
+        Returns the number of seconds to wait before retrying a failed request, or None if it should not be retried.
+
+        Args:
+            attempt (int): The number of retries already made.
+        """
+        if attempt >= self.request_retries:
+            return None
+
+        delay = LLM_RETRY_BACKOFF * 2 ** attempt
+        remaining = get_remaining_time()
+        if remaining is not None and remaining - delay < LLM_MIN_TIMEOUT:
+            return None
+
+        return delay
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        attempt = 0
+        while True:
+            try:
+                return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                delay = self.get_retry_delay(attempt)
+                if delay is None:
+                    raise
+                logger.warning(f"LLM request failed, retrying in {delay:.1f} seconds: {e}")
+                time.sleep(delay)
+                attempt += 1
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        attempt = 0
+        while True:
+            streamed = False
+            try:
+                for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    streamed = True
+                    yield chunk
+                return
+            except RETRYABLE_ERRORS as e:
+                # Tokens already sent to the client cannot be taken back, so only requests that streamed nothing are retried
+                delay = None if streamed else self.get_retry_delay(attempt)
+                if delay is None:
+                    raise
+                logger.warning(f"LLM request failed, retrying in {delay:.1f} seconds: {e}")
+                time.sleep(delay)
+                attempt += 1
+
 
 def get_azure_openai_variables():
     load_dotenv()
@@ -17,13 +108,16 @@ def get_azure_openai_variables():
 def get_azure_openai_llm():
     AOAI_ENDPOINT, AOAI_KEY, AOAI_API_VERSION, _, AOAI_COMPLETIONS = get_azure_openai_variables()
 
-    llm = AzureChatOpenAI(
+    llm = DeadlineAzureChatOpenAI(
         temperature = 0.3,
         openai_api_version = AOAI_API_VERSION,
         azure_endpoint = AOAI_ENDPOINT,
         openai_api_key = AOAI_KEY,
         azure_deployment = AOAI_COMPLETIONS,
-        max_tokens=(CONTEXT_LENGTH_LIMIT//2)
+        max_tokens=(CONTEXT_LENGTH_LIMIT//2),
+        request_timeout=LLM_REQUEST_TIMEOUT,
+        # Retries are made by the model, with timeouts bounded by the request's deadline
+        max_retries=0
     )
 
     return llm
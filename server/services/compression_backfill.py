@@ -0,0 +1,101 @@
+"""
+This module defines a migration that compresses the large text fields written before compression was enabled.
+
+Run it from the server directory, for example:
+    python -m services.compression_backfill --collection chat_turns --collection chat_summaries
+"""
+
+import argparse
+import logging
+
+from pymongo import UpdateOne
+
+from services.azure_mongodb import MongoDBClient
+from utils.compression import compress_text
+from utils.consts import COMPRESSION_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Name of the compressed text field of each collection
+COMPRESSED_FIELDS = {
+    "chat_turns": "History",
+    "chat_summaries": "summary_text",
+}
+
+
+def get_field_updates(collection_name: str, document: dict) -> dict:
+    """
+    Returns the fields of a document that change once compressed, or an empty dictionary if none do.
+    """
+    if collection_name == "chat_turn_buckets":
+        messages = document.get("messages", [])
+        compressed = [
+            {**message, "History": compress_text(message["History"], collection_name)}
+            for message in messages
+        ]
+        changed = any(new["History"] is not old["History"] for new, old in zip(compressed, messages))
+        return {"messages": compressed} if changed else {}
+
+    field = COMPRESSED_FIELDS[collection_name]
+    value = document.get(field)
+    compressed = compress_text(value, collection_name) if isinstance(value, str) else value
+    return {field: compressed} if compressed is not value else {}
+
+
+def backfill_collection(db, collection_name: str, batch_size: int = 500) -> int:
+    """
+    Compresses the uncompressed text fields of a collection in batches.
+
+    Args:
+        db (Database): The database holding the collection.
+        collection_name (str): The collection to backfill, as configured in COMPRESSION_SETTINGS.
+        batch_size (int): The number of documents updated per bulk write.
+
+    Returns:
+        int: The number of documents updated.
+    """
+    if collection_name not in COMPRESSION_SETTINGS:
+        raise ValueError(f"Compression is not configured for collection '{collection_name}'")
+
+    if collection_name == "chat_turn_buckets":
+        query, projection = {"messages.History": {"$type": "string"}}, {"messages": 1}
+    else:
+        field = COMPRESSED_FIELDS[collection_name]
+        query, projection = {field: {"$type": "string"}}, {field: 1}
+
+    updated = 0
+    operations = []
+    for document in db[collection_name].find(query, projection).batch_size(batch_size):
+        updates = get_field_updates(collection_name, document)
+        if updates:
+            operations.append(UpdateOne({"_id": document["_id"]}, {"$set": updates}))
+
+        if len(operations) >= batch_size:
+            updated += db[collection_name].bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += db[collection_name].bulk_write(operations, ordered=False).modified_count
+
+    logger.info(f"Compressed {updated} documents in {collection_name}")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress large text fields stored before compression was enabled.")
+    parser.add_argument(
+        "--collection",
+        action="append",
+        choices=sorted(COMPRESSION_SETTINGS),
+        help="Collection to backfill, can be repeated. Defaults to every configured collection."
+    )
+    parser.add_argument("--batch-size", type=int, default=500, help="Number of documents updated per bulk write.")
+    args = parser.parse_args()
+
+    db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+    for collection_name in args.collection or sorted(COMPRESSION_SETTINGS):
+        backfill_collection(db, collection_name, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
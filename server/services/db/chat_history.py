@@ -0,0 +1,366 @@
+from services.azure_mongodb import MongoDBClient
+from utils.consts import HISTORY_WINDOW_MAX_MESSAGES, CHAT_BUCKET_SIZE, SESSION_CACHE_TTL, SESSION_CACHE_SIZE
+from utils.token_counter import count_message_tokens, get_token_counter, TOKEN_COUNT_KEY
+from utils.compression import compress_text, decompress_text
+
+import json
+import logging
+import os
+import threading
+from typing import Callable, Iterator, Sequence
+
+from cachetools import TTLCache
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, SystemMessage, message_to_dict, messages_from_dict
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+CHAT_TURNS_COLLECTION = "chat_turns"
+CHAT_TURN_BUCKETS_COLLECTION = "chat_turn_buckets"
+
+# Stores new chats in per-session buckets of messages instead of one document per message
+CHAT_HISTORY_BUCKETS = os.getenv("CHAT_HISTORY_BUCKETS", "").lower() in ("1", "true")
+
+# Attempts to append a turn when concurrent writers fill up the latest bucket first
+BUCKET_WRITE_ATTEMPTS = 3
+
+_index_lock = threading.Lock()
+_indexed_collections = set()
+
+# History class of each session whose storage layout was looked up, a session never changes layout
+_session_layouts = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+_session_layouts_lock = threading.Lock()
+
+
+def ensure_index(collection, keys: list, **kwargs):
+    """
+    Creates an index used to read a session's messages, once per collection and process.
+    """
+    with _index_lock:
+        if collection.name not in _indexed_collections:
+            collection.create_index(keys, **kwargs)
+            _indexed_collections.add(collection.name)
+
+
+def get_chat_history(session_id: str, token_limit: int = None, summary_loader: Callable[[], str] = None) -> BaseChatMessageHistory:
+    """
+    Returns the chat history of a session, in the storage layout configured for the app.
+
+    Args:
+        session_id (str): The session whose messages are read and written.
+        token_limit (int): If set, the token budget of the messages returned by `messages`.
+        summary_loader (Callable[[], str]): Returns a summary of the earlier conversation.
+    """
+    history_class = get_history_class(session_id)
+    return history_class(session_id, token_limit=token_limit, summary_loader=summary_loader)
+
+
+def get_history_class(session_id: str) -> type:
+    """
+    Returns the history class of a session. When buckets are enabled, new sessions are bucketed,
+    while sessions that were started with one document per message keep their `chat_turns` documents,
+    so that turning buckets on does not hide the history of ongoing conversations.
+    """
+    if not CHAT_HISTORY_BUCKETS:
+        return MongoDBChatHistory
+
+    with _session_layouts_lock:
+        history_class = _session_layouts.get(session_id)
+    if history_class is not None:
+        return history_class
+
+    db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+    try:
+        is_legacy_session = (
+            db[CHAT_TURN_BUCKETS_COLLECTION].find_one({"SessionId": session_id}, {"_id": 1}) is None
+            and db[CHAT_TURNS_COLLECTION].find_one({"SessionId": session_id}, {"_id": 1}) is not None
+        )
+    except PyMongoError as e:
+        logger.error(f"Error looking up the chat history layout of session {session_id}: {str(e)}")
+        return BucketedChatHistory
+
+    history_class = MongoDBChatHistory if is_legacy_session else BucketedChatHistory
+
+    with _session_layouts_lock:
+        _session_layouts[session_id] = history_class
+
+    return history_class
+
+
+class MongoDBChatHistory(BaseChatMessageHistory):
+    """
+    Chat message history stored in the `chat_turns` collection, using the process-wide MongoDB client.
+
+    Documents keep the layout used by LangChain's MongoDBChatMessageHistory (`SessionId` and a JSON `History`),
+    so existing chats remain readable. Large `History` payloads are compressed as configured for the collection.
+    The token count of each message is stored next to it as `TokenCount` when it is written, and exposed in
+    the message's response metadata when it is read, so that trimming never has to tokenize the history again.
+
+    When a token limit is set, `messages` only returns the most recent messages that fit in it, which is what
+    RunnableWithMessageHistory loads into the prompt on every turn.
+
+    Args:
+        session_id (str): The session whose messages are read and written.
+        token_limit (int): If set, the token budget of the messages returned by `messages`.
+        summary_loader (Callable[[], str]): Returns a summary of the earlier conversation, prepended to the
+            window when older messages were left out.
+    """
+
+    def __init__(self, session_id: str, token_limit: int = None, summary_loader: Callable[[], str] = None):
+        self.session_id = session_id
+        self.token_limit = token_limit
+        self.summary_loader = summary_loader
+        self.db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+        self.collection = self.get_collection()
+
+    def get_collection(self):
+        collection = self.db[CHAT_TURNS_COLLECTION]
+        ensure_index(collection, [("SessionId", ASCENDING), ("_id", DESCENDING)])
+        return collection
+
+    @property
+    def messages(self) -> list[BaseMessage]:
+        """Retrieve the messages of the session, oldest first, within the token limit if one is set."""
+        if self.token_limit is not None:
+            return self.get_window(self.token_limit)
+        return self.get_messages()
+
+    def iter_documents(self, newest_first: bool = False, limit: int = None, offset: int = 0) -> Iterator[dict]:
+        """
+        Iterates over the stored documents of the session's messages.
+
+        Args:
+            newest_first (bool): Whether to start from the most recent message.
+            limit (int): If set, the maximum number of documents read.
+            offset (int): The number of documents skipped before the first one read.
+        """
+        cursor = self.collection.find(
+            {"SessionId": self.session_id},
+            {"History": 1, "TokenCount": 1}
+        ).sort("_id", DESCENDING if newest_first else ASCENDING)
+        if offset:
+            cursor = cursor.skip(offset)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+
+        yield from cursor
+
+    def count_messages(self) -> int:
+        """Counts the messages of the session without reading them."""
+        return self.collection.count_documents({"SessionId": self.session_id})
+
+    def get_messages(self, limit: int = None, offset: int = 0) -> list[BaseMessage]:
+        """
+        Retrieves the messages of the session, oldest first.
+
+        Args:
+            limit (int): If set, only the last `limit` messages are read.
+            offset (int): The number of oldest messages left out, used to read only the messages after them.
+        """
+        try:
+            if limit is not None:
+                documents = list(self.iter_documents(newest_first=True, limit=limit))
+            else:
+                documents = list(self.iter_documents(offset=offset))
+        except PyMongoError as e:
+            logger.error(f"Error reading chat history for session {self.session_id}: {str(e)}")
+            return []
+
+        if limit is not None:
+            documents.reverse()
+
+        return [MongoDBChatHistory.to_message(document) for document in documents]
+
+    @staticmethod
+    def to_message(document: dict) -> BaseMessage:
+        """
+        Converts a stored document into a message, carrying over its stored token count.
+        """
+        message = messages_from_dict([json.loads(decompress_text(document["History"]))])[0]
+        if document.get("TokenCount") is not None:
+            message.response_metadata[TOKEN_COUNT_KEY] = document["TokenCount"]
+
+        return message
+
+    def to_documents(self, messages: Sequence[BaseMessage]) -> list[dict]:
+        """
+        Converts messages into the documents stored for them, counting their tokens in a single batch.
+        """
+        token_counts = get_token_counter().count_messages(messages)
+
+        return [
+            {
+                "History": compress_text(json.dumps(message_to_dict(message)), self.collection.name),
+                "TokenCount": token_count,
+            }
+            for message, token_count in zip(messages, token_counts)
+        ]
+
+    def get_window(self, token_limit: int, max_messages: int = HISTORY_WINDOW_MAX_MESSAGES) -> list[BaseMessage]:
+        """
+        Retrieves the most recent messages of the session that fit in the token limit, oldest first.
+
+        Messages are read newest first, so reading stops as soon as the budget is spent. The window always
+        starts with a user message; if older messages were left out and a summary loader is set,
+        the summary of the earlier conversation is prepended as a system message.
+
+        Args:
+            token_limit (int): The token budget of the returned messages.
+            max_messages (int): The maximum number of messages read, whatever their size.
+        """
+        window = []
+        dropped = False
+        used_tokens = 0
+
+        try:
+            documents = self.iter_documents(newest_first=True, limit=max_messages + 1)
+            for index, document in enumerate(documents):
+                message = MongoDBChatHistory.to_message(document)
+                message_tokens = count_message_tokens(message)
+                if index == max_messages or used_tokens + message_tokens > token_limit:
+                    dropped = True
+                    break
+                window.append(message)
+                used_tokens += message_tokens
+        except PyMongoError as e:
+            logger.error(f"Error reading chat history for session {self.session_id}: {str(e)}")
+            return []
+
+        window.reverse()
+
+        # Avoid opening the window with a reply whose question was cut off
+        while window and window[0].type != "human":
+            window.pop(0)
+            dropped = True
+
+        if dropped and self.summary_loader:
+            summary = self.summary_loader()
+            if summary:
+                window.insert(0, SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+
+        return window
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Append messages to the session in a single write."""
+        if not messages:
+            return
+
+        try:
+            self.collection.insert_many([
+                {"SessionId": self.session_id, **document}
+                for document in self.to_documents(messages)
+            ])
+        except PyMongoError as e:
+            logger.error(f"Error saving chat history for session {self.session_id}: {str(e)}")
+
+    def clear(self) -> None:
+        """Delete all the messages of the session."""
+        try:
+            self.collection.delete_many({"SessionId": self.session_id})
+        except PyMongoError as e:
+            logger.error(f"Error clearing chat history for session {self.session_id}: {str(e)}")
+
+
+class BucketedChatHistory(MongoDBChatHistory):
+    """
+    Chat message history stored in the `chat_turn_buckets` collection, where each document holds
+    up to `CHAT_BUCKET_SIZE` consecutive messages of a session.
+
+    A whole turn is appended to the latest bucket with a single `$push`, and the tail of a session
+    is read from its last one or two buckets.
+    """
+
+    def get_collection(self):
+        collection = self.db[CHAT_TURN_BUCKETS_COLLECTION]
+        ensure_index(collection, [("SessionId", ASCENDING), ("bucket", DESCENDING)], unique=True)
+        return collection
+
+    def iter_documents(self, newest_first: bool = False, limit: int = None, offset: int = 0) -> Iterator[dict]:
+        query = {"SessionId": self.session_id}
+        if offset:
+            # Buckets entirely before the offset are found from their counts and never read
+            first_bucket, offset = self.find_bucket(offset)
+            if first_bucket is None:
+                return
+            query["bucket"] = {"$gte": first_bucket}
+
+        cursor = self.collection.find(
+            query,
+            {"messages": 1}
+        ).sort("bucket", DESCENDING if newest_first else ASCENDING)
+        if limit is not None:
+            # Fetch buckets two at a time, so that a short tail is read without loading older buckets
+            cursor = cursor.limit(-(-limit // CHAT_BUCKET_SIZE) + 1).batch_size(2)
+
+        read = 0
+        for bucket in cursor:
+            documents = bucket.get("messages", [])
+            if offset:
+                documents, offset = documents[offset:], 0
+            for document in (reversed(documents) if newest_first else documents):
+                if limit is not None and read == limit:
+                    return
+                yield document
+                read += 1
+
+    def find_bucket(self, offset: int) -> tuple[int | None, int]:
+        """
+        Finds the bucket holding the message at the given offset of the session.
+
+        Returns:
+            tuple: The bucket's number, or None if the session has fewer messages, and the message's offset in it.
+        """
+        buckets = self.collection.find({"SessionId": self.session_id}, {"bucket": 1, "count": 1}).sort("bucket", ASCENDING)
+        for bucket in buckets:
+            if offset < bucket["count"]:
+                return bucket["bucket"], offset
+            offset -= bucket["count"]
+
+        return None, 0
+
+    def count_messages(self) -> int:
+        """Counts the messages of the session from its bucket counts, without reading them."""
+        buckets = self.collection.find({"SessionId": self.session_id}, {"count": 1})
+        return sum(bucket["count"] for bucket in buckets)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Append messages to the latest bucket of the session in a single write, starting a new bucket when it is full."""
+        if not messages:
+            return
+
+        documents = self.to_documents(messages)
+
+        try:
+            for _ in range(BUCKET_WRITE_ATTEMPTS):
+                latest = self.collection.find_one(
+                    {"SessionId": self.session_id},
+                    {"bucket": 1, "count": 1},
+                    sort=[("bucket", DESCENDING)]
+                )
+
+                bucket = 0
+                if latest:
+                    bucket = latest["bucket"]
+                    if latest["count"] + len(documents) > CHAT_BUCKET_SIZE:
+                        bucket += 1
+
+                try:
+                    # Upserting into a full bucket fails on the unique index, so the turn is retried on the next bucket
+                    self.collection.update_one(
+                        {
+                            "SessionId": self.session_id,
+                            "bucket": bucket,
+                            "count": {"$lte": max(CHAT_BUCKET_SIZE - len(documents), 0)}
+                        },
+                        {"$push": {"messages": {"$each": documents}}, "$inc": {"count": len(documents)}},
+                        upsert=True
+                    )
+                    return
+                except DuplicateKeyError:
+                    continue
+
+            logger.error(f"Could not append messages to a bucket for session {self.session_id}")
+        except PyMongoError as e:
+            logger.error(f"Error saving chat history for session {self.session_id}: {str(e)}")
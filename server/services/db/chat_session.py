@@ -0,0 +1,49 @@
+from services.azure_mongodb import MongoDBClient
+from utils.consts import SESSION_CACHE_SIZE, SESSION_CACHE_TTL
+
+import logging
+import threading
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+
+# Chat sessions known to exist, keyed by user ID and chat ID
+_session_cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+_session_cache_lock = threading.Lock()
+
+
+def register_chat_session(user_id: str, chat_id: int):
+    """
+    Marks a newly created chat session as valid, so that its turns are not checked against the database.
+    """
+    with _session_cache_lock:
+        _session_cache[(user_id, int(chat_id))] = True
+
+
+def is_valid_chat_session(user_id: str, chat_id: int) -> bool:
+    """
+    Checks that a chat session was started by the given user.
+    Known sessions are answered from the cache, others with a single lookup on the user and chat IDs.
+    """
+    key = (user_id, int(chat_id))
+    with _session_cache_lock:
+        if key in _session_cache:
+            return True
+
+    if db["chat_summaries"].find_one({"user_id": user_id, "chat_id": int(chat_id)}, {"_id": 1}) is None:
+        return False
+
+    register_chat_session(user_id, chat_id)
+    return True
+
+
+def invalidate_chat_sessions(user_id: str):
+    """
+    Forgets the cached sessions of a user, so that deleted chats are no longer accepted.
+    """
+    with _session_cache_lock:
+        for key in [key for key in _session_cache if key[0] == user_id]:
+            del _session_cache[key]
@@ -0,0 +1,196 @@
+from services.azure_mongodb import MongoDBClient
+from utils.token_counter import count_tokens
+from utils.compression import decompress_text
+from utils.consts import SUMMARY_CONTEXT_TOKEN_LIMIT, SUMMARY_CACHE_TTL, SUMMARY_CACHE_SIZE, SUMMARY_VERSION_TTL
+from utils.consts import DIGEST_CONTEXT_LIMIT, DIGEST_CONTEXT_TOKEN_LIMIT
+
+import logging
+import threading
+from typing import Iterable
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+
+# Cached entries are stored with the version of the user's summaries they were built from.
+# Summaries can be rewritten by other processes, such as Celery workers or another worker's compaction job,
+# so the version is bumped in the database and entries built from an older version are ignored.
+# Per-user list of past summary texts, newest first and already fitted to the token budget
+_summary_cache = TTLCache(maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL)
+# Per-user vector store over past summaries, used for semantic retrieval
+_summary_store_cache = TTLCache(maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL)
+# Per-user summary version, re-read from the database once it expires
+_summary_version_cache = TTLCache(maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_VERSION_TTL)
+_summary_cache_lock = threading.Lock()
+
+
+def get_summary_version(user_id: str) -> int:
+    """
+    Returns the version of the user's summaries, which is bumped every time they are written or compacted.
+    """
+    with _summary_cache_lock:
+        version = _summary_version_cache.get(user_id)
+    if version is not None:
+        return version
+
+    document = db["summary_versions"].find_one({"_id": user_id}, {"version": 1})
+    version = (document or {}).get("version", 0)
+
+    with _summary_cache_lock:
+        _summary_version_cache[user_id] = version
+
+    return version
+
+
+def get_cached(cache: TTLCache, key, version: int):
+    """
+    Returns a cached value if it was built from the given version of the summaries, None otherwise.
+    """
+    with _summary_cache_lock:
+        entry = cache.get(key)
+    if entry is None or entry[0] != version:
+        return None
+    return entry[1]
+
+
+def fit_to_token_limit(summaries: Iterable[str], token_limit: int = SUMMARY_CONTEXT_TOKEN_LIMIT) -> list[str]:
+    """
+    Keeps summaries in the given order until the next one would exceed the token limit.
+    """
+    fitted = []
+    used_tokens = 0
+    for summary_text in summaries:
+        summary_tokens = count_tokens(summary_text)
+        if used_tokens + summary_tokens > token_limit:
+            break
+        fitted.append(summary_text)
+        used_tokens += summary_tokens
+
+    return fitted
+
+
+def get_past_summaries(user_id: str, token_limit: int = SUMMARY_CONTEXT_TOKEN_LIMIT) -> list[str]:
+    """
+    Retrieves the user's past chat summaries, newest first, keeping only as many as fit in the token limit.
+    Summaries already rolled into a digest are left out.
+    Results are cached per user until a new summary is written or the cache entry expires.
+    """
+    version = get_summary_version(user_id)
+    cached = get_cached(_summary_cache, (user_id, token_limit), version)
+    if cached is not None:
+        return cached
+
+    cursor = db["chat_summaries"].find(
+        {"user_id": user_id, "summary_text": {"$nin": ["", None]}, "compacted": {"$ne": True}},
+        {"summary_text": 1, "_id": 0}
+    ).sort("chat_id", -1)
+
+    summaries = fit_to_token_limit((decompress_text(doc["summary_text"]) for doc in cursor), token_limit)
+
+    with _summary_cache_lock:
+        _summary_cache[(user_id, token_limit)] = (version, summaries)
+
+    return summaries
+
+
+def get_recent_digests(user_id: str, limit: int = DIGEST_CONTEXT_LIMIT, token_limit: int = DIGEST_CONTEXT_TOKEN_LIMIT) -> list[str]:
+    """
+    Retrieves the text of the user's most recent weekly and monthly digests, newest first.
+    Results are cached per user alongside the summaries.
+    """
+    version = get_summary_version(user_id)
+    cached = get_cached(_summary_cache, (user_id, "digests"), version)
+    if cached is not None:
+        return cached
+
+    cursor = db["chat_digests"].find(
+        {"user_id": user_id, "compacted": {"$ne": True}},
+        {"summary_text": 1, "_id": 0}
+    ).sort("end_chat_id", -1).limit(limit)
+
+    digests = fit_to_token_limit((doc["summary_text"] for doc in cursor), token_limit)
+
+    with _summary_cache_lock:
+        _summary_cache[(user_id, "digests")] = (version, digests)
+
+    return digests
+
+
+def get_chat_summary(user_id: str, chat_id: int) -> str:
+    """
+    Retrieves the rolling summary of a single chat, or an empty string if none was written yet.
+    """
+    summary = db["chat_summaries"].find_one(
+        {"user_id": user_id, "chat_id": int(chat_id)},
+        {"summary_text": 1, "_id": 0}
+    )
+
+    return decompress_text((summary or {}).get("summary_text")) or ""
+
+
+def is_first_chat(user_id: str, chat_id: int) -> bool:
+    """
+    Checks whether a chat is the user's first, that is no chat of theirs was started before it.
+    """
+    earlier_chat = db["chat_summaries"].find_one(
+        {"user_id": user_id, "chat_id": {"$lt": int(chat_id)}},
+        {"_id": 1}
+    )
+
+    return earlier_chat is None
+
+
+def get_summary_embeddings(user_id: str) -> list[dict]:
+    """
+    Retrieves the chat ID, text and embedding vector of every non-empty summary of the user.
+    The vector is missing for summaries written before embeddings were stored.
+    """
+    summaries = db["chat_summaries"].find(
+        {"user_id": user_id, "summary_text": {"$nin": ["", None]}, "compacted": {"$ne": True}},
+        {"chat_id": 1, "summary_text": 1, "summary_vector": 1, "_id": 0}
+    )
+
+    return [{**summary, "summary_text": decompress_text(summary["summary_text"])} for summary in summaries]
+
+
+def save_summary_embedding(user_id: str, chat_id: int, summary_vector: list[float]):
+    """
+    Stores the embedding vector of a chat summary next to its text.
+    """
+    db["chat_summaries"].update_one(
+        {"user_id": user_id, "chat_id": int(chat_id)},
+        {"$set": {"summary_vector": summary_vector}}
+    )
+
+
+def get_cached_summary_store(user_id: str, version: int):
+    """
+    Returns the vector store cached for the given version of the user's summaries, or None if it must be rebuilt.
+    """
+    return get_cached(_summary_store_cache, user_id, version)
+
+
+def cache_summary_store(user_id: str, store, version: int):
+    """
+    Caches the vector store built over the user's summaries.
+    The version must be read before the summaries the store was built from, so that a store built while
+    another process rewrote them is kept under the older version and ignored.
+    """
+    with _summary_cache_lock:
+        _summary_store_cache[user_id] = (version, store)
+
+
+def invalidate_summary_cache(user_id: str):
+    """
+    Drops the cached summaries and summary vector store of a user, so that the next read reflects the database.
+    The user's summary version is bumped too, so that other processes drop theirs within SUMMARY_VERSION_TTL seconds.
+    """
+    db["summary_versions"].update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+
+    with _summary_cache_lock:
+        for key in [key for key in _summary_cache if key[0] == user_id]:
+            del _summary_cache[key]
+        _summary_store_cache.pop(user_id, None)
+        _summary_version_cache.pop(user_id, None)
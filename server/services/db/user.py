@@ -44,3 +44,44 @@ def get_user_profile_by_user_id(user_id: str) -> str:
     if "contentVector" in doc:
         del doc["contentVector"]
     return json.dumps(doc, default=str)
+
+
+def get_user_name(user_id: str) -> str:
+    """
+    Retrieves the user's name, or an empty string for anonymous or unknown users.
+    """
+    try:
+        user_objectid = ObjectId(user_id)
+    except (InvalidId, TypeError):
+        return ""
+
+    doc = db["users"].find_one({"_id": user_objectid}, {"name": 1, "_id": 0})
+    return (doc or {}).get("name") or ""
+
+
+# Profile fields included in the prompt, with the label they are introduced by
+PROFILE_FACT_LABELS = {
+    "name": "Name",
+    "age": "Age",
+    "gender": "Gender",
+    "placeOfResidence": "Lives in",
+    "fieldOfWork": "Works in",
+}
+
+
+def get_user_profile_facts(user_id: str) -> str:
+    """
+    Retrieves a compact, single-line description of the user's profile to be included in the prompt.
+    Returns an empty string for anonymous or unknown users.
+    """
+    try:
+        user_objectid = ObjectId(user_id)
+    except (InvalidId, TypeError):
+        return ""
+
+    projection = {field: 1 for field in PROFILE_FACT_LABELS}
+    doc = db["users"].find_one({"_id": user_objectid}, {**projection, "_id": 0})
+    if not doc:
+        return ""
+
+    return "; ".join(f"{label}: {doc[field]}" for field, label in PROFILE_FACT_LABELS.items() if doc.get(field))
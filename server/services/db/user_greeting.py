@@ -0,0 +1,27 @@
+from services.azure_mongodb import MongoDBClient
+
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+
+
+def get_user_greeting(user_id: str) -> str | None:
+    """
+    Retrieves the greeting precomputed for the user's next session, or None if there is none yet.
+    """
+    greeting = db["user_greetings"].find_one({"_id": user_id}, {"message": 1})
+    return greeting["message"] if greeting else None
+
+
+def save_user_greeting(user_id: str, message: str):
+    """
+    Stores the greeting served at the start of the user's next session, replacing the previous one.
+    """
+    db["user_greetings"].update_one(
+        {"_id": user_id},
+        {"$set": {"user_id": user_id, "message": message, "created_at": datetime.now()}},
+        upsert=True
+    )
@@ -36,3 +36,24 @@ def get_user_journey_by_user_id(user_id: str) -> UserJourney:
         return None
 
 
+def get_user_journey_facts(user_id: str) -> str:
+    """
+    Retrieves a compact, single-line description of the user's goals, concerns and exercises to be included in the prompt.
+    Returns an empty string if the user has no journey yet.
+    """
+    journey = get_user_journey_by_user_id(user_id)
+    if not journey:
+        return ""
+
+    facts = []
+    if journey.patient_goals:
+        facts.append(f"Goals: {', '.join(journey.patient_goals)}")
+    if journey.mental_health_concerns:
+        concerns = ", ".join(f"{concern.label} ({concern.severity})" for concern in journey.mental_health_concerns)
+        facts.append(f"Concerns: {concerns}")
+    if journey.therapy_plan and journey.therapy_plan.exercise:
+        facts.append(f"Exercises: {', '.join(journey.therapy_plan.exercise)}")
+
+    return "; ".join(facts)
+
+
@@ -0,0 +1,206 @@
+"""
+This module runs chat finalization (mood detection and summarization), rolling chat summary updates
+and greeting precomputation as background jobs.
+
+Jobs are dispatched to Celery when CELERY_BROKER_URL is set, with workers started through
+`celery -A services.finalize_jobs worker`. Otherwise they run on an in-process thread pool.
+Job state is kept in the `finalize_jobs` collection, so any API worker can report on it.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from celery import Celery
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from agents.agent_registry import AgentRegistry
+from agents.mental_health_agent import MentalHealthAIAgent
+from services.azure_mongodb import MongoDBClient
+from utils.consts import FINALIZE_MAX_WORKERS, FINALIZE_JOB_STALE_AFTER
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
+
+celery_app = Celery("mental-health", broker=CELERY_BROKER_URL) if CELERY_BROKER_URL else None
+_executor = None if celery_app else ThreadPoolExecutor(max_workers=FINALIZE_MAX_WORKERS, thread_name_prefix="finalize")
+
+# Sessions whose summary update is queued or running on the in-process executor
+_pending_updates = set()
+_pending_updates_lock = threading.Lock()
+
+db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+
+
+def get_job_id(user_id, chat_id) -> str:
+    return f"{user_id}-{chat_id}"
+
+
+def serialize_job(job: dict) -> dict:
+    return {
+        "job_id": job["_id"],
+        "user_id": job["user_id"],
+        "chat_id": job["chat_id"],
+        "status": job["status"],
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat(),
+    }
+
+
+def get_finalize_job(job_id: str) -> dict | None:
+    """
+    Retrieves the state of a finalization job, or None if it does not exist.
+    """
+    job = db["finalize_jobs"].find_one({"_id": job_id})
+    return serialize_job(job) if job else None
+
+
+def submit_finalize_job(user_id: str, chat_id: int) -> dict:
+    """
+    Queues the finalization of a chat and returns the job's state.
+
+    Submitting the same chat again returns the existing job, unless it failed or was not updated
+    for FINALIZE_JOB_STALE_AFTER seconds, for example because the process running it restarted,
+    in which case it is queued again.
+    """
+    job_id = get_job_id(user_id, chat_id)
+    now = datetime.now()
+    stale_before = now - timedelta(seconds=FINALIZE_JOB_STALE_AFTER)
+
+    try:
+        job = db["finalize_jobs"].find_one_and_update(
+            {
+                "_id": job_id,
+                "$or": [
+                    {"status": FAILED},
+                    {"status": {"$in": [QUEUED, RUNNING]}, "updated_at": {"$lt": stale_before}},
+                ]
+            },
+            {"$set": {"status": QUEUED, "error": None, "updated_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            job = {
+                "_id": job_id,
+                "user_id": user_id,
+                "chat_id": int(chat_id),
+                "status": QUEUED,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            db["finalize_jobs"].insert_one(job)
+    except DuplicateKeyError:
+        # The chat is already queued, running or finalized
+        return get_finalize_job(job_id)
+
+    logger.info(f"Queued finalization job {job_id}")
+    if celery_app:
+        finalize_chat_task.delay(job_id, user_id, chat_id)
+    else:
+        _executor.submit(run_finalize_job, job_id, user_id, chat_id)
+
+    return serialize_job(job)
+
+
+def run_finalize_job(job_id: str, user_id: str, chat_id: int):
+    """
+    Runs the finalization of a chat and records the outcome on its job.
+    """
+    db["finalize_jobs"].update_one(
+        {"_id": job_id},
+        {"$set": {"status": RUNNING, "updated_at": datetime.now()}}
+    )
+
+    try:
+        agent = AgentRegistry.get_agent(MentalHealthAIAgent)
+        agent.perform_final_processes(user_id, chat_id)
+    except Exception as e:
+        logger.error(f"Finalization job {job_id} failed: {e}", exc_info=True)
+        db["finalize_jobs"].update_one(
+            {"_id": job_id},
+            {"$set": {"status": FAILED, "error": str(e), "updated_at": datetime.now()}}
+        )
+        return
+
+    db["finalize_jobs"].update_one(
+        {"_id": job_id},
+        {"$set": {"status": COMPLETED, "updated_at": datetime.now()}}
+    )
+    logger.info(f"Finalization job {job_id} completed")
+
+    # The new summary is in place, prepare the greeting of the user's next session
+    run_greeting_update(user_id)
+
+
+def run_greeting_update(user_id: str):
+    """
+    Precomputes the greeting served at the start of the user's next session.
+    """
+    try:
+        agent = AgentRegistry.get_agent(MentalHealthAIAgent)
+        agent.precompute_greeting(user_id)
+    except Exception as e:
+        logger.error(f"Greeting update for user {user_id} failed: {e}", exc_info=True)
+
+
+def submit_greeting_update(user_id: str):
+    """
+    Queues the precomputation of a user's next greeting, off the request path.
+    """
+    if celery_app:
+        update_greeting_task.delay(user_id)
+    else:
+        _executor.submit(run_greeting_update, user_id)
+
+
+def run_summary_update(user_id: str, chat_id: int):
+    """
+    Folds the latest turns of a chat into its rolling summary, if enough of them have accumulated.
+    """
+    try:
+        agent = AgentRegistry.get_agent(MentalHealthAIAgent)
+        agent.exec_update_step(user_id, chat_id)
+    except Exception as e:
+        logger.error(f"Summary update for chat {chat_id} of user {user_id} failed: {e}", exc_info=True)
+    finally:
+        with _pending_updates_lock:
+            _pending_updates.discard(get_job_id(user_id, chat_id))
+
+
+def submit_summary_update(user_id: str, chat_id: int):
+    """
+    Queues a rolling summary update for a chat, off the request path.
+    Does nothing if an update for the same chat is already queued on this worker.
+    """
+    if celery_app:
+        update_summary_task.delay(user_id, chat_id)
+        return
+
+    session_id = get_job_id(user_id, chat_id)
+    with _pending_updates_lock:
+        if session_id in _pending_updates:
+            return
+        _pending_updates.add(session_id)
+
+    _executor.submit(run_summary_update, user_id, chat_id)
+
+
+if celery_app:
+    finalize_chat_task = celery_app.task(name="finalize_chat")(run_finalize_job)
+    update_summary_task = celery_app.task(name="update_summary")(run_summary_update)
+    update_greeting_task = celery_app.task(name="update_greeting")(run_greeting_update)
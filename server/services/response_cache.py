@@ -0,0 +1,125 @@
+"""
+This module defines a semantic cache of agent responses to questions that do not depend on the user,
+such as questions about the AI itself or general mental health topics.
+A question is answered from the cache when its embedding is close enough to the embedding of a cached question.
+"""
+
+import re
+import threading
+import time
+
+import numpy as np
+
+from utils.consts import RESPONSE_CACHE_SIMILARITY, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE
+
+# Tools whose results are the same for every user, so responses built on them can be shared
+SHAREABLE_TOOLS = {
+    "vector_search_agent_facts",
+    "get_tavily_search_results",
+    "get_google_search_results",
+    "get_bing_search_results",
+    "get_youtube_search_results",
+}
+
+# Questions about the user or the ongoing conversation are never answered from the cache
+PERSONAL_PATTERN = re.compile(
+    r"\b(i|i'm|im|i've|i'd|i'll|me|my|mine|myself|we|us|our|ours|earlier|before|again|last time|you said|remember)\b",
+    re.IGNORECASE
+)
+
+# Acknowledgements and references to earlier turns, which can only be answered with the conversation's history
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(yes|yeah|yep|yup|no|nope|ok|okay|sure|thanks|thank you|that|this|these|those|it|they|them|one|ones|"
+    r"what about|how about|the (first|second|third|last|other)|you (suggest|suggested|mentioned|recommended))\b",
+    re.IGNORECASE
+)
+
+# Messages shorter than this, such as "Why?" or "Go on", are treated as follow-ups
+MIN_SELF_CONTAINED_WORDS = 3
+
+
+def is_shareable_question(message: str) -> bool:
+    """
+    Returns whether a message is a self-contained question whose answer does not depend on who asks it,
+    nor on the earlier turns of the conversation.
+    """
+    if not message or len(message.split()) < MIN_SELF_CONTAINED_WORDS:
+        return False
+
+    return PERSONAL_PATTERN.search(message) is None and FOLLOW_UP_PATTERN.search(message) is None
+
+
+class SemanticResponseCache:
+    """
+    Caches responses by the embedding of the question they answer, evicting entries once they expire
+    or, when the cache is full, starting with the oldest.
+
+    Args:
+        threshold (float): The minimum cosine similarity for a cached question to match.
+        ttl (int): The number of seconds a response is kept.
+        maxsize (int): The maximum number of cached responses.
+    """
+
+    def __init__(self, threshold: float = RESPONSE_CACHE_SIMILARITY, ttl: int = RESPONSE_CACHE_TTL, maxsize: int = RESPONSE_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._entries = []  # (response, expires_at), in the same order as the vectors
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(vector: list[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _evict_expired(self, now: float):
+        keep = [index for index, (_, expires_at) in enumerate(self._entries) if expires_at > now]
+        if len(keep) < len(self._entries):
+            self._vectors = self._vectors[keep]
+            self._entries = [self._entries[index] for index in keep]
+
+    def lookup(self, vector: list[float]) -> str | None:
+        """
+        Returns the cached response to the most similar question, or None if no cached question is similar enough.
+        """
+        query = SemanticResponseCache.normalize(vector)
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            if not self._entries or self._vectors.shape[1] != query.shape[0]:
+                return None
+
+            similarities = self._vectors @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            return self._entries[best][0]
+
+    def store(self, vector: list[float], response: str):
+        """
+        Caches the response to the question with the given embedding.
+        """
+        entry = SemanticResponseCache.normalize(vector)
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+
+            if not self._entries or self._vectors.shape[1] != entry.shape[0]:
+                self._vectors = np.empty((0, entry.shape[0]), dtype=np.float32)
+                self._entries = []
+            elif len(self._entries) >= self.maxsize:
+                self._vectors = self._vectors[1:]
+                self._entries = self._entries[1:]
+
+            self._vectors = np.vstack([self._vectors, entry])
+            self._entries.append((response, now + self.ttl))
+
+    def clear(self):
+        with self._lock:
+            self._vectors = np.empty((0, 0), dtype=np.float32)
+            self._entries = []
+
+
+response_cache = SemanticResponseCache()
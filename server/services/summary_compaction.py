@@ -0,0 +1,187 @@
+"""
+This module defines a background job that rolls old chat summaries into weekly digests,
+and old weekly digests into monthly digests, so that the context read on every turn stays small.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+import schedule
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from agents.agent_registry import AgentRegistry
+from agents.mental_health_agent import MentalHealthAIAgent
+from models.chat_digest import ChatDigest, DigestPeriod
+from services.azure_mongodb import MongoDBClient
+from services.db.chat_summary import invalidate_summary_cache
+from utils.compression import decompress_text
+from utils.consts import WEEKLY_DIGEST_AGE_DAYS, MONTHLY_DIGEST_AGE_DAYS
+
+logger = logging.getLogger(__name__)
+
+
+def get_period_start(timestamp: int, period: DigestPeriod) -> int:
+    """
+    Returns the Unix timestamp of the start of the week (Monday) or month containing the given timestamp.
+    """
+    day = datetime.fromtimestamp(timestamp).date()
+    if period == DigestPeriod.WEEK:
+        start = day - timedelta(days=day.weekday())
+    else:
+        start = day.replace(day=1)
+
+    return int(datetime.combine(start, datetime.min.time()).timestamp())
+
+
+def get_chat_id_range(source: dict) -> tuple[int, int]:
+    """
+    Returns the oldest and newest chat IDs covered by a summary, which covers one chat, or by a digest.
+    """
+    if "chat_id" in source:
+        return source["chat_id"], source["chat_id"]
+    return source["start_chat_id"], source["end_chat_id"]
+
+
+class SummaryCompactionScheduler:
+    def __init__(self):
+        self.scheduler = schedule.Scheduler()
+        self.db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+
+    def get_agent(self) -> MentalHealthAIAgent:
+        return AgentRegistry.get_agent(MentalHealthAIAgent)
+
+    def compact_sources(self, user_id, sources, period: DigestPeriod, source_collection: str):
+        """
+        Groups source documents by period and rebuilds the digest of each group.
+
+        Sources are first tagged with their digest's ID, and each digest is rebuilt from every source tagged with it,
+        rather than by folding new texts into the stored digest. Running it twice, concurrently or after a crash
+        between the writes, therefore never rolls the same source into a digest twice.
+
+        Args:
+            user_id (str): The user whose documents are compacted.
+            sources (list[dict]): Summaries or digests to compact, with their chat IDs.
+            period (DigestPeriod): The period of the digests to write.
+            source_collection (str): The collection the sources are read from.
+        """
+        groups = {}
+        for source in sources:
+            period_start = get_period_start(get_chat_id_range(source)[0], period)
+            groups.setdefault(period_start, []).append(source)
+
+        for period_start, group in groups.items():
+            digest_id = ChatDigest.get_digest_id(user_id, period, period_start)
+            self.db[source_collection].update_many(
+                {"_id": {"$in": [source["_id"] for source in group]}},
+                {"$set": {"digest_id": digest_id}}
+            )
+
+            # Late arrivals are rebuilt together with the sources already in the digest
+            members = sorted(
+                self.db[source_collection].find(
+                    {"digest_id": digest_id},
+                    {"chat_id": 1, "start_chat_id": 1, "end_chat_id": 1, "summary_text": 1}
+                ),
+                key=get_chat_id_range
+            )
+            if not members:
+                continue
+
+            digest = ChatDigest(
+                user_id=user_id,
+                period=period,
+                period_start=period_start,
+                start_chat_id=get_chat_id_range(members[0])[0],
+                end_chat_id=max(get_chat_id_range(source)[1] for source in members),
+                source_count=len(members),
+                summary_text=self.get_agent().get_digest_from_summaries(
+                    [decompress_text(source["summary_text"]) for source in members]
+                ),
+            )
+
+            try:
+                # A concurrent run that saw more sources may already have written a fuller digest, keep it
+                self.db["chat_digests"].update_one(
+                    {"_id": digest_id, "source_count": {"$lte": digest.source_count}},
+                    {"$set": digest.model_dump(mode="json")},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                logger.info(f"Kept the fuller digest {digest_id} written by a concurrent run")
+
+            self.db[source_collection].update_many(
+                {"_id": {"$in": [source["_id"] for source in members]}},
+                {"$set": {"compacted": True}}
+            )
+
+            logger.info(f"Compacted {len(members)} {source_collection} documents into {digest_id}")
+
+    def compact_user(self, user_id, now: datetime = None):
+        """
+        Rolls the user's old summaries into weekly digests, then old weekly digests into monthly digests.
+        """
+        now = now or datetime.now()
+
+        weekly_cutoff = int((now - timedelta(days=WEEKLY_DIGEST_AGE_DAYS)).timestamp())
+        summaries = list(self.db["chat_summaries"].find(
+            {
+                "user_id": user_id,
+                "chat_id": {"$lt": weekly_cutoff},
+                "summary_text": {"$nin": ["", None]},
+                "compacted": {"$ne": True}
+            },
+            {"chat_id": 1}
+        ))
+        self.compact_sources(user_id, summaries, DigestPeriod.WEEK, "chat_summaries")
+
+        monthly_cutoff = int((now - timedelta(days=MONTHLY_DIGEST_AGE_DAYS)).timestamp())
+        weekly_digests = list(self.db["chat_digests"].find(
+            {
+                "user_id": user_id,
+                "period": DigestPeriod.WEEK.value,
+                "end_chat_id": {"$lt": monthly_cutoff},
+                "compacted": {"$ne": True}
+            },
+            {"start_chat_id": 1, "end_chat_id": 1}
+        ))
+        self.compact_sources(user_id, weekly_digests, DigestPeriod.MONTH, "chat_digests")
+
+        if summaries or weekly_digests:
+            invalidate_summary_cache(user_id)
+
+    def compact_all(self, now: datetime = None):
+        """
+        Compacts the summaries of every user that has summaries or weekly digests old enough to be rolled up.
+        """
+        now = now or datetime.now()
+
+        weekly_cutoff = int((now - timedelta(days=WEEKLY_DIGEST_AGE_DAYS)).timestamp())
+        user_ids = set(self.db["chat_summaries"].distinct(
+            "user_id",
+            {"chat_id": {"$lt": weekly_cutoff}, "summary_text": {"$nin": ["", None]}, "compacted": {"$ne": True}}
+        ))
+
+        # Users whose summaries are all compacted still have weekly digests to roll into monthly ones
+        monthly_cutoff = int((now - timedelta(days=MONTHLY_DIGEST_AGE_DAYS)).timestamp())
+        user_ids.update(self.db["chat_digests"].distinct(
+            "user_id",
+            {"period": DigestPeriod.WEEK.value, "end_chat_id": {"$lt": monthly_cutoff}, "compacted": {"$ne": True}}
+        ))
+
+        for user_id in user_ids:
+            try:
+                self.compact_user(user_id, now)
+            except PyMongoError as e:
+                logger.error(f"Database error compacting summaries for user {user_id}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error compacting summaries for user {user_id}: {str(e)}", exc_info=True)
+
+    def schedule_compaction(self):
+        self.scheduler.every().day.at("03:00").do(self.compact_all)
+
+    def run_scheduler(self):
+        self.schedule_compaction()
+        while True:
+            self.scheduler.run_pending()
+            time.sleep(60)
@@ -0,0 +1,71 @@
+import sys
+sys.path.append(".")
+
+import threading
+import time
+
+from agents.agent_registry import AgentRegistry
+from agents.ai_agent import AIAgent
+
+
+class FakeAgent(AIAgent):
+    """Stands in for an agent, recording the tool sets it was built with instead of creating an LLM and tools."""
+    builds = []
+    release = threading.Event()
+
+    def __init__(self, tool_names: list[str] = []):
+        if "slow" in tool_names:
+            FakeAgent.release.wait(5)
+        FakeAgent.builds.append(sorted(tool_names))
+        self.llm = object()
+        self.tool_map = {name: object() for name in tool_names}
+        self.tools = list(self.tool_map.values())
+        self._build_executor()
+
+    def _build_executor(self):
+        self.executor_tools = sorted(self.tool_map)
+
+
+def reset_registry():
+    AgentRegistry.clear()
+    FakeAgent.builds = []
+    FakeAgent.release.set()
+
+
+def test_tool_subsets_share_the_full_agent():
+    """
+    Test to ensure agents for subsets of a tool set share the LLM and tools of the agent holding the whole set,
+    which is built once, and only build their own executor.
+    """
+    reset_registry()
+    available_tools = ["agent_facts", "generate_suggestions", "web_search_google"]
+
+    facts_agent = AgentRegistry.get_agent(FakeAgent, ["agent_facts"], available_tools)
+    search_agent = AgentRegistry.get_agent(FakeAgent, ["agent_facts", "web_search_google"], available_tools)
+    full_agent = AgentRegistry.get_agent(FakeAgent, available_tools)
+
+    assert FakeAgent.builds == [available_tools]
+    assert facts_agent.llm is search_agent.llm is full_agent.llm
+    assert facts_agent.tool_map["agent_facts"] is full_agent.tool_map["agent_facts"]
+    assert facts_agent.executor_tools == ["agent_facts"]
+    assert search_agent.executor_tools == ["agent_facts", "web_search_google"]
+    assert AgentRegistry.get_agent(FakeAgent, ["agent_facts"], available_tools) is facts_agent
+
+
+def test_slow_build_does_not_block_other_agents():
+    """Test to ensure an agent being built does not hold up requests for agents with other tools."""
+    reset_registry()
+    FakeAgent.release.clear()
+    slow_build = threading.Thread(target=AgentRegistry.get_agent, args=(FakeAgent, ["slow"]))
+    slow_build.start()
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    AgentRegistry.get_agent(FakeAgent, ["agent_facts"])
+
+    assert time.monotonic() - start < 1
+    assert FakeAgent.builds == [["agent_facts"]]
+
+    FakeAgent.release.set()
+    slow_build.join()
+    assert FakeAgent.builds == [["agent_facts"], ["slow"]]
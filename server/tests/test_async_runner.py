@@ -0,0 +1,32 @@
+import sys
+sys.path.append(".")
+
+import asyncio
+import time
+
+from utils.async_runner import gather_async, run_async
+
+
+def test_gather_async_runs_concurrently_in_order():
+    """
+    Test to ensure coroutines run concurrently on the shared loop and results keep their order.
+    """
+    async def delayed(value, delay):
+        await asyncio.sleep(delay)
+        return value
+
+    start = time.monotonic()
+    results = gather_async([delayed("first", 0.2), delayed("second", 0.1), delayed("third", 0.2)])
+
+    assert results == ["first", "second", "third"]
+    assert time.monotonic() - start < 0.5
+
+
+def test_run_async_inside_running_loop():
+    """
+    Test to ensure coroutines can be run from synchronous code called by an already running event loop.
+    """
+    async def outer():
+        return run_async(asyncio.sleep(0, result="done"))
+
+    assert asyncio.run(outer()) == "done"
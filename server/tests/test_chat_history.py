@@ -0,0 +1,103 @@
+import sys
+sys.path.append(".")
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from services.db import chat_history
+from services.db.chat_history import BucketedChatHistory, MongoDBChatHistory
+from utils.token_counter import count_message_tokens
+
+
+def test_history_window_keeps_newest_within_budget(db):
+    """
+    Test to ensure the window returns the newest messages, oldest first, and starts with a user message.
+    """
+    history = MongoDBChatHistory("window_user-1")
+    history.add_messages([
+        HumanMessage(content="question one " + "word " * 20),
+        AIMessage(content="answer one " + "word " * 20),
+        HumanMessage(content="question two " + "word " * 20),
+        AIMessage(content="answer two " + "word " * 20),
+    ])
+
+    window = history.get_window(token_limit=80)
+
+    assert [message.content.split(" ")[0:2] for message in window] == [["question", "two"], ["answer", "two"]]
+
+
+def test_history_window_prepends_summary_of_dropped_messages(db):
+    """
+    Test to ensure the summary is only prepended when older messages were left out.
+    """
+    history = MongoDBChatHistory("window_user-2", token_limit=1000, summary_loader=lambda: "Earlier they talked about sleep.")
+    history.add_messages([HumanMessage(content="hello"), AIMessage(content="hi")])
+    assert len(history.messages) == 2
+
+    history.token_limit = 5
+    history.add_messages([HumanMessage(content="how are you"), AIMessage(content="good")])
+    window = history.messages
+
+    assert window[0].type == "system"
+    assert "sleep" in window[0].content
+    assert [message.content for message in window[1:]] == ["how are you", "good"]
+
+
+def test_history_stores_token_counts(db):
+    """
+    Test to ensure token counts are stored when messages are written and used when they are read back.
+    """
+    history = MongoDBChatHistory("window_user-3")
+    history.add_messages([HumanMessage(content="hello there"), AIMessage(content="hi")])
+
+    stored = db["chat_turns"].find_one({"SessionId": "window_user-3"})
+    assert stored["TokenCount"] == count_message_tokens(HumanMessage(content="hello there"))
+
+    db["chat_turns"].update_one({"_id": stored["_id"]}, {"$set": {"TokenCount": 500}})
+    message = history.messages[0]
+
+    assert count_message_tokens(message) == 500
+
+
+def test_bucketed_history_appends_turns_to_buckets(db, monkeypatch):
+    """
+    Test to ensure turns are appended to the latest bucket until it is full, and read back in order.
+    """
+    monkeypatch.setattr(chat_history, "CHAT_BUCKET_SIZE", 4)
+    history = BucketedChatHistory("bucket_user-1")
+    for turn in range(3):
+        history.add_messages([HumanMessage(content=f"question {turn}"), AIMessage(content=f"answer {turn}")])
+
+    buckets = list(db["chat_turn_buckets"].find({"SessionId": "bucket_user-1"}).sort("bucket", 1))
+    assert [bucket["count"] for bucket in buckets] == [4, 2]
+
+    assert [message.content for message in history.get_messages(limit=3)] == ["answer 1", "question 2", "answer 2"]
+    assert len(history.messages) == 6
+
+
+def test_buckets_keep_legacy_sessions_readable(db, monkeypatch):
+    """
+    Test to ensure sessions started before buckets were enabled keep their history, while new sessions are bucketed.
+    """
+    MongoDBChatHistory("legacy_user-1").add_messages([HumanMessage(content="hello"), AIMessage(content="hi")])
+    monkeypatch.setattr(chat_history, "CHAT_HISTORY_BUCKETS", True)
+
+    history = chat_history.get_chat_history("legacy_user-1")
+    history.add_messages([HumanMessage(content="how are you"), AIMessage(content="good")])
+
+    assert [message.content for message in history.messages] == ["hello", "hi", "how are you", "good"]
+    assert db["chat_turn_buckets"].find_one({"SessionId": "legacy_user-1"}) is None
+    assert isinstance(chat_history.get_chat_history("legacy_user-2"), BucketedChatHistory)
+
+
+def test_bucketed_history_reads_after_offset(db, monkeypatch):
+    """
+    Test to ensure messages after an offset are read without the buckets before it, and counted from bucket counts.
+    """
+    monkeypatch.setattr(chat_history, "CHAT_BUCKET_SIZE", 4)
+    history = BucketedChatHistory("bucket_user-2")
+    for turn in range(4):
+        history.add_messages([HumanMessage(content=f"question {turn}"), AIMessage(content=f"answer {turn}")])
+
+    assert history.count_messages() == 8
+    assert [message.content for message in history.get_messages(offset=5)] == ["answer 2", "question 3", "answer 3"]
+    assert history.get_messages(offset=8) == []
@@ -0,0 +1,21 @@
+import sys
+sys.path.append(".")
+
+from services.db.chat_session import is_valid_chat_session, invalidate_chat_sessions
+
+
+def test_chat_session_validation(db):
+    """
+    Test to ensure sessions are only valid for the user that started them, and are cached once validated.
+    """
+    db["chat_summaries"].insert_one({"user_id": "session_user", "chat_id": 100, "summary_text": ""})
+
+    assert is_valid_chat_session("session_user", 100)
+    assert not is_valid_chat_session("other_user", 100)
+    assert not is_valid_chat_session("session_user", 101)
+
+    db["chat_summaries"].delete_many({"user_id": "session_user"})
+    assert is_valid_chat_session("session_user", 100)
+
+    invalidate_chat_sessions("session_user")
+    assert not is_valid_chat_session("session_user", 100)
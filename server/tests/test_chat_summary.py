@@ -0,0 +1,73 @@
+import sys
+sys.path.append(".")
+
+from services.db.chat_summary import get_past_summaries, invalidate_summary_cache
+from services.db.chat_summary import get_summary_version, get_cached_summary_store, cache_summary_store
+
+
+def test_past_summaries_newest_first_within_budget(db):
+    """
+    Test to ensure summaries are returned newest first and stop at the token limit.
+    """
+    user_id = "summary_budget_user"
+    for chat_id in range(3):
+        db["chat_summaries"].insert_one({
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "summary_text": f"summary {chat_id} " + "word " * 50
+        })
+
+    summaries = get_past_summaries(user_id, token_limit=150)
+
+    assert len(summaries) == 2
+    assert summaries[0].startswith("summary 2")
+    assert summaries[1].startswith("summary 1")
+
+
+def test_past_summaries_cache_invalidation(db):
+    """
+    Test to ensure a new summary is only visible once the user's cache is invalidated.
+    """
+    user_id = "summary_cache_user"
+    db["chat_summaries"].insert_one({"user_id": user_id, "chat_id": 1, "summary_text": "first"})
+    assert get_past_summaries(user_id) == ["first"]
+
+    db["chat_summaries"].insert_one({"user_id": user_id, "chat_id": 2, "summary_text": "second"})
+    assert get_past_summaries(user_id) == ["first"]
+
+    invalidate_summary_cache(user_id)
+    assert get_past_summaries(user_id) == ["second", "first"]
+
+
+def test_summary_cache_invalidated_by_other_processes(db, monkeypatch):
+    """
+    Test to ensure cached summaries are dropped once another process bumps the user's summary version.
+    """
+    import services.db.chat_summary as chat_summary
+
+    user_id = "summary_version_user"
+    db["chat_summaries"].insert_one({"user_id": user_id, "chat_id": 1, "summary_text": "first"})
+    assert get_past_summaries(user_id) == ["first"]
+
+    # Another process writes a summary and bumps the version, this process only sees it once its version expires
+    db["chat_summaries"].insert_one({"user_id": user_id, "chat_id": 2, "summary_text": "second"})
+    db["summary_versions"].update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+    assert get_past_summaries(user_id) == ["first"]
+
+    chat_summary._summary_version_cache.clear()
+    assert get_past_summaries(user_id) == ["second", "first"]
+
+
+def test_summary_store_built_before_version_bump_is_ignored(db):
+    """
+    Test to ensure a vector store built while the summaries were rewritten is not served under the new version.
+    """
+    user_id = "summary_store_version_user"
+    version = get_summary_version(user_id)
+
+    # The summaries change while the store is being built
+    invalidate_summary_cache(user_id)
+    cache_summary_store(user_id, "stale store", version)
+
+    assert get_cached_summary_store(user_id, version) == "stale store"
+    assert get_cached_summary_store(user_id, get_summary_version(user_id)) is None
@@ -0,0 +1,44 @@
+import sys
+sys.path.append(".")
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from services.compression_backfill import backfill_collection
+from services.db.chat_history import MongoDBChatHistory
+from services.db.chat_summary import get_chat_summary
+from utils.compression import compress_text, decompress_text
+
+
+def test_compress_text_above_threshold():
+    """
+    Test to ensure only large texts are compressed, and that both forms read back as the original text.
+    """
+    short_text = "feeling better today"
+    long_text = "The user talked about their week at work. " * 100
+
+    assert compress_text(short_text, "chat_summaries") is short_text
+    assert isinstance(compress_text(long_text, "chat_summaries"), bytes)
+    assert decompress_text(compress_text(long_text, "chat_summaries")) == long_text
+    assert decompress_text(short_text) == short_text
+
+
+def test_backfill_compresses_existing_fields(db):
+    """
+    Test to ensure the backfill compresses large fields written as plain text, and that reads are unaffected.
+    """
+    long_text = "The user talked about their week at work. " * 100
+    db["chat_summaries"].insert_one({"user_id": "compression_user", "chat_id": 1, "summary_text": long_text})
+    history = MongoDBChatHistory("compression_user-1")
+    history.collection.insert_one({
+        "SessionId": "compression_user-1",
+        "History": '{"type": "human", "data": {"content": "%s", "type": "human"}}' % long_text
+    })
+    history.add_messages([AIMessage(content=long_text)])
+
+    assert backfill_collection(db, "chat_summaries") == 1
+    assert backfill_collection(db, "chat_turns") == 1
+
+    assert isinstance(db["chat_summaries"].find_one({"user_id": "compression_user"})["summary_text"], bytes)
+    assert get_chat_summary("compression_user", 1) == long_text
+    assert [message.content for message in history.messages] == [long_text, long_text]
+    assert isinstance(history.messages[0], HumanMessage)
@@ -0,0 +1,106 @@
+import sys
+sys.path.append(".")
+
+import time
+
+import httpx
+import openai
+import pytest
+
+from agents.mental_health_agent import MentalHealthAIAgent
+from services.azure import DeadlineAzureChatOpenAI
+from utils.deadline import bound_timeout, deadline, get_remaining_time
+
+
+def test_timeouts_bounded_by_deadline():
+    """Test to ensure timeouts are shortened to the time left, and an earlier outer deadline is kept."""
+    assert get_remaining_time() is None
+    assert bound_timeout(30) == 30
+
+    with deadline(5):
+        assert bound_timeout(30) <= 5
+        with deadline(60):
+            assert get_remaining_time() <= 5
+
+    assert get_remaining_time() is None
+
+
+class TimingOutClient:
+    """A chat completions client whose first requests time out."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.timeouts = []
+
+    def create(self, **payload):
+        self.timeouts.append(payload["timeout"])
+        if len(self.timeouts) <= self.failures:
+            time.sleep(0.05)
+            raise openai.APITimeoutError(request=httpx.Request("POST", "https://example.invalid"))
+        return {
+            "model": "test",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+
+def get_test_llm(client: TimingOutClient) -> DeadlineAzureChatOpenAI:
+    llm = DeadlineAzureChatOpenAI(
+        azure_endpoint="https://example.invalid", openai_api_key="key", openai_api_version="2024-05-01-preview",
+        azure_deployment="test", max_retries=0, request_retries=2)
+    llm.client = client
+    return llm
+
+
+def test_llm_retries_bounded_by_deadline(monkeypatch):
+    """Test to ensure every retry of an LLM request gets a timeout bounded by the time left, and none starts past the deadline."""
+    monkeypatch.setattr("services.azure.LLM_RETRY_BACKOFF", 0.01)
+
+    client = TimingOutClient(failures=2)
+    with deadline(10):
+        assert get_test_llm(client).invoke("hi").content == "ok"
+
+    assert len(client.timeouts) == 3
+    assert client.timeouts[0] <= 10
+    assert client.timeouts[0] > client.timeouts[1] > client.timeouts[2]
+
+    client = TimingOutClient(failures=2)
+    with deadline(1.02):
+        with pytest.raises(openai.APITimeoutError):
+            get_test_llm(client).invoke("hi")
+
+    assert len(client.timeouts) == 1
+
+
+def test_context_prefetch_bounded_by_deadline(monkeypatch):
+    """Test to ensure a turn stops waiting for context that is not ready before its deadline, and answers without it."""
+    agent = MentalHealthAIAgent.__new__(MentalHealthAIAgent)
+    monkeypatch.setattr(agent, "get_session_window", lambda user_id, chat_id: (f"{user_id}-{chat_id}", ["turn"]))
+    monkeypatch.setattr(agent, "get_past_context", lambda user_id, message: time.sleep(0.5) or "summaries")
+    monkeypatch.setattr(MentalHealthAIAgent, "get_user_context", staticmethod(lambda user_id: "facts"))
+
+    start = time.monotonic()
+    with deadline(0.2):
+        inputs, session_id = agent.get_invocation_args("hi", "user", 1)
+
+    assert time.monotonic() - start < 0.4
+    assert session_id == "user-1"
+    assert inputs["chat_turns"] == ["turn"]
+    assert inputs["past_summaries"] == ""
+    assert inputs["user_context"] == "facts"
+
+
+def test_context_prefetch_waits_share_one_budget(monkeypatch):
+    """Test to ensure the waits for a turn's context share one prefetch budget instead of getting one each."""
+    agent = MentalHealthAIAgent.__new__(MentalHealthAIAgent)
+    monkeypatch.setattr("agents.mental_health_agent.CONTEXT_PREFETCH_TIMEOUT", 0.2)
+    monkeypatch.setattr(agent, "get_session_window", lambda user_id, chat_id: time.sleep(0.5) or ("user-1", ["turn"]))
+    monkeypatch.setattr(agent, "get_past_context", lambda user_id, message: time.sleep(0.5) or "summaries")
+    monkeypatch.setattr(MentalHealthAIAgent, "get_user_context", staticmethod(lambda user_id: time.sleep(0.5) or "facts"))
+
+    start = time.monotonic()
+    inputs, session_id = agent.get_invocation_args("hi", "user", 1)
+
+    assert time.monotonic() - start < 0.35
+    assert session_id == "user-1"
+    assert inputs["chat_turns"] == [] and inputs["past_summaries"] == "" and inputs["user_context"] == ""
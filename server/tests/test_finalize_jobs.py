@@ -0,0 +1,123 @@
+import sys
+sys.path.append(".")
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+from services import finalize_jobs
+from services.finalize_jobs import submit_finalize_job, get_finalize_job, get_job_id
+from utils.consts import FINALIZE_JOB_STALE_AFTER
+
+
+class FakeFinalizeAgent:
+    """Stands in for the mental health agent, finalizing chats without calling the LLM."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def perform_final_processes(self, user_id, chat_id):
+        self.calls.append((user_id, chat_id))
+        self.release.wait(5)
+        if len(self.calls) <= self.failures:
+            raise RuntimeError("summarization failed")
+
+    def precompute_greeting(self, user_id):
+        pass
+
+
+def use_agent(monkeypatch, agent: FakeFinalizeAgent):
+    monkeypatch.setattr(finalize_jobs.AgentRegistry, "get_agent", lambda agent_class: agent)
+
+
+def wait_for_job(job_id: str, statuses: tuple = (finalize_jobs.COMPLETED, finalize_jobs.FAILED)) -> dict:
+    for _ in range(100):
+        job = get_finalize_job(job_id)
+        if job and job["status"] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not reach {statuses}")
+
+
+def test_resubmitting_a_job_returns_the_existing_one(db, monkeypatch):
+    """
+    Test to ensure submitting a chat that is queued, running or finalized returns its job instead of running it again.
+    """
+    agent = FakeFinalizeAgent()
+    agent.release.clear()
+    use_agent(monkeypatch, agent)
+
+    job = submit_finalize_job("finalize_user", 1)
+    resubmitted = submit_finalize_job("finalize_user", 1)
+
+    assert resubmitted["job_id"] == job["job_id"] == get_job_id("finalize_user", 1)
+    assert resubmitted["status"] in (finalize_jobs.QUEUED, finalize_jobs.RUNNING)
+
+    agent.release.set()
+    assert wait_for_job(job["job_id"])["status"] == finalize_jobs.COMPLETED
+    assert submit_finalize_job("finalize_user", 1)["status"] == finalize_jobs.COMPLETED
+    assert agent.calls == [("finalize_user", 1)]
+
+
+def test_failed_and_stale_jobs_are_requeued(db, monkeypatch):
+    """
+    Test to ensure failed jobs, and queued or running jobs that stopped making progress, are queued again,
+    while jobs that are still making progress are not.
+    """
+    agent = FakeFinalizeAgent(failures=1)
+    use_agent(monkeypatch, agent)
+
+    job = submit_finalize_job("finalize_user", 2)
+    assert wait_for_job(job["job_id"])["status"] == finalize_jobs.FAILED
+
+    submit_finalize_job("finalize_user", 2)
+    assert wait_for_job(job["job_id"])["status"] == finalize_jobs.COMPLETED
+    assert len(agent.calls) == 2
+
+    for chat_id, status in ((3, finalize_jobs.QUEUED), (4, finalize_jobs.RUNNING)):
+        stale_at = datetime.now() - timedelta(seconds=FINALIZE_JOB_STALE_AFTER + 60)
+        db["finalize_jobs"].insert_one({
+            "_id": get_job_id("finalize_user", chat_id),
+            "user_id": "finalize_user",
+            "chat_id": chat_id,
+            "status": status,
+            "error": None,
+            "created_at": stale_at,
+            "updated_at": stale_at,
+        })
+        submit_finalize_job("finalize_user", chat_id)
+        assert wait_for_job(get_job_id("finalize_user", chat_id))["status"] == finalize_jobs.COMPLETED
+
+    now = datetime.now()
+    db["finalize_jobs"].insert_one({
+        "_id": get_job_id("finalize_user", 5),
+        "user_id": "finalize_user",
+        "chat_id": 5,
+        "status": finalize_jobs.RUNNING,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    })
+    assert submit_finalize_job("finalize_user", 5)["status"] == finalize_jobs.RUNNING
+    assert ("finalize_user", 5) not in agent.calls
+
+
+def test_finalize_job_status_endpoint(app, monkeypatch):
+    """
+    Test to ensure the status of a finalization job can be polled, and unknown jobs are reported as not found.
+    """
+    use_agent(monkeypatch, FakeFinalizeAgent())
+    job = submit_finalize_job("finalize_user", 6)
+    wait_for_job(job["job_id"])
+
+    client = app.test_client()
+    response = client.get(f"/ai/mental_health/finalize/jobs/{job['job_id']}")
+
+    assert response.status_code == 200
+    assert response.get_json()["status"] == finalize_jobs.COMPLETED
+    assert response.get_json()["chat_id"] == 6
+
+    assert client.get("/ai/mental_health/finalize/jobs/unknown-job").status_code == 404
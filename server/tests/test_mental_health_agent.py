@@ -0,0 +1,94 @@
+import sys
+sys.path.append(".")
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents.mental_health_agent import MentalHealthAIAgent
+from services.db.chat_history import MongoDBChatHistory
+from utils.consts import FIRST_SESSION_INSTRUCTIONS
+
+
+def get_test_agent(monkeypatch, on_update=None) -> tuple[MentalHealthAIAgent, list]:
+    """
+    Returns an agent whose summaries are written without the LLM, and the list of messages each summary was given.
+    """
+    agent = MentalHealthAIAgent.__new__(MentalHealthAIAgent)
+    folded = []
+
+    def get_updated_summary(summary, new_messages):
+        folded.append([message.content for message in new_messages])
+        if on_update:
+            on_update()
+        return f"{summary} + {len(new_messages)}"
+
+    monkeypatch.setattr(agent, "get_updated_summary", get_updated_summary)
+    return agent, folded
+
+
+def add_turns(session_id: str, count: int):
+    MongoDBChatHistory(session_id).add_messages([
+        message
+        for turn in range(count)
+        for message in (HumanMessage(content=f"question {turn}"), AIMessage(content=f"answer {turn}"))
+    ])
+
+
+def test_summary_update_folds_only_new_messages(db, monkeypatch):
+    """
+    Test to ensure only the messages after the summarized ones are folded in, and the stale embedding is dropped.
+    """
+    add_turns("update_user-1", 3)
+    db["chat_summaries"].insert_one({
+        "user_id": "update_user", "chat_id": 1, "summary_text": "old",
+        "summarized_message_count": 2, "summary_vector": [1.0]
+    })
+    agent, folded = get_test_agent(monkeypatch)
+
+    assert agent.exec_update_step("update_user", 1, min_new_turns=3) == "old"
+    assert agent.exec_update_step("update_user", 1, min_new_turns=2) == "old + 4"
+
+    assert folded == [["question 1", "answer 1", "question 2", "answer 2"]]
+    stored = db["chat_summaries"].find_one({"user_id": "update_user", "chat_id": 1})
+    assert stored["summarized_message_count"] == 6
+    assert "summary_vector" not in stored
+
+
+def test_concurrent_summary_update_is_not_overwritten(db, monkeypatch):
+    """
+    Test to ensure an update that folded the same messages as a concurrent one does not overwrite its summary.
+    """
+    add_turns("update_user-2", 2)
+    db["chat_summaries"].insert_one({
+        "user_id": "update_user", "chat_id": 2, "summary_text": "old", "summarized_message_count": 0
+    })
+
+    def concurrent_update():
+        db["chat_summaries"].update_one(
+            {"user_id": "update_user", "chat_id": 2},
+            {"$set": {"summary_text": "theirs", "summarized_message_count": 4}}
+        )
+
+    agent, _ = get_test_agent(monkeypatch, on_update=concurrent_update)
+
+    assert agent.exec_update_step("update_user", 2, min_new_turns=1) == "theirs"
+    stored = db["chat_summaries"].find_one({"user_id": "update_user", "chat_id": 2})
+    assert stored["summary_text"] == "theirs"
+    assert stored["summarized_message_count"] == 4
+
+
+def test_first_session_turns_get_the_introduction(db, monkeypatch):
+    """
+    Test to ensure every turn of the user's first session is given the introduction, and turns of later sessions are not.
+    """
+    agent = MentalHealthAIAgent.__new__(MentalHealthAIAgent)
+    monkeypatch.setattr(agent, "get_session_window", lambda user_id, chat_id: (f"{user_id}-{chat_id}", []))
+    monkeypatch.setattr(agent, "get_past_context", lambda user_id, message: "")
+    monkeypatch.setattr(MentalHealthAIAgent, "get_user_context", staticmethod(lambda user_id: ""))
+    for chat_id in (10, 20):
+        db["chat_summaries"].insert_one({"user_id": "intro_user", "chat_id": chat_id, "summary_text": ""})
+
+    first_inputs, _ = agent.get_invocation_args("hi", "intro_user", 10)
+    later_inputs, _ = agent.get_invocation_args("hi", "intro_user", 20)
+
+    assert first_inputs["session_context"] == FIRST_SESSION_INSTRUCTIONS
+    assert later_inputs["session_context"] == ""
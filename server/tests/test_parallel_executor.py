@@ -0,0 +1,132 @@
+import sys
+sys.path.append(".")
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+
+from agents import parallel_executor
+from agents.parallel_executor import ParallelAgentExecutor
+from utils.consts import AGENT_TIMEOUT_RESPONSE
+from utils.deadline import deadline, get_remaining_time
+
+
+@tool
+def slow_search(query: str) -> str:
+    """Searches slowly."""
+    time.sleep(0.3)
+    return f"search: {query}"
+
+
+@tool
+def slow_profile(query: str) -> str:
+    """Reads the profile slowly."""
+    time.sleep(0.2)
+    return f"profile: {query}"
+
+
+def plan(inputs):
+    if inputs["intermediate_steps"]:
+        return AgentFinish({"output": "done"}, "done")
+    return [
+        AgentAction("slow_search", {"query": "sleep"}, ""),
+        AgentAction("slow_profile", {"query": "user"}, ""),
+    ]
+
+
+def test_tool_calls_run_concurrently_in_call_order():
+    """Test to ensure the tool calls of one step run concurrently and their results keep the call order."""
+    executor = ParallelAgentExecutor(
+        agent=RunnableLambda(plan), tools=[slow_search, slow_profile], return_intermediate_steps=True)
+
+    start = time.monotonic()
+    result = executor.invoke({"input": "hi"})
+
+    assert time.monotonic() - start < 0.45
+    assert [observation for _, observation in result["intermediate_steps"]] == ["search: sleep", "profile: user"]
+    assert not result["stopped"] and not result["tool_timed_out"]
+
+
+def test_slow_tool_calls_time_out():
+    """Test to ensure a tool call that exceeds the timeout is answered with a timeout message."""
+    executor = ParallelAgentExecutor(
+        agent=RunnableLambda(plan), tools=[slow_search, slow_profile], return_intermediate_steps=True,
+        tool_timeout=0.25)
+
+    result = executor.invoke({"input": "hi"})
+
+    observations = [observation for _, observation in result["intermediate_steps"]]
+    assert "did not answer in time" in observations[0]
+    assert observations[1] == "profile: user"
+    assert result["tool_timed_out"]
+
+
+def test_planning_time_not_taken_from_tool_timeout():
+    """Test to ensure the tool timeout starts once the calls are dispatched, not while the model is still planning them."""
+    def slow_plan(inputs):
+        if inputs["intermediate_steps"]:
+            return AgentFinish({"output": "done"}, "done")
+        time.sleep(0.5)
+        return [AgentAction("slow_profile", {"query": "user"}, "")]
+
+    executor = ParallelAgentExecutor(
+        agent=RunnableLambda(slow_plan), tools=[slow_profile], return_intermediate_steps=True, tool_timeout=0.6)
+
+    result = executor.invoke({"input": "hi"})
+
+    assert [observation for _, observation in result["intermediate_steps"]] == ["profile: user"]
+    assert not result["tool_timed_out"]
+
+
+def test_runaway_loop_stops_with_partial_answer():
+    """Test to ensure a run that exceeds its iteration budget ends with a fallback answer instead of a stop message."""
+    executor = ParallelAgentExecutor(
+        agent=RunnableLambda(lambda inputs: [AgentAction("slow_profile", {"query": "user"}, "")]),
+        tools=[slow_profile], max_iterations=2)
+
+    result = executor.invoke({"input": "hi"})
+
+    assert result["output"] == AGENT_TIMEOUT_RESPONSE
+    assert result["stopped"]
+
+
+def test_run_stops_at_deadline():
+    """Test to ensure tool calls are cut short by the request's deadline and the run ends with a fallback answer."""
+    executor = ParallelAgentExecutor(agent=RunnableLambda(plan), tools=[slow_search, slow_profile])
+
+    start = time.monotonic()
+    with deadline(0.1):
+        result = executor.invoke({"input": "hi"})
+
+    assert time.monotonic() - start < 0.2
+    assert result["output"] == AGENT_TIMEOUT_RESPONSE
+
+
+def test_timed_out_tool_calls_are_cancelled(monkeypatch):
+    """Test to ensure a call still queued when its step times out never runs, and running calls see the step's deadline."""
+    monkeypatch.setattr(parallel_executor, "_tool_executor", ThreadPoolExecutor(max_workers=1))
+    remaining_times = []
+
+    @tool
+    def timed_search(query: str) -> str:
+        """Searches slowly, noting the time it was given."""
+        remaining_times.append(get_remaining_time())
+        time.sleep(0.3)
+        return f"search: {query}"
+
+    executor = ParallelAgentExecutor(
+        agent=RunnableLambda(lambda inputs: AgentFinish({"output": "done"}, "done") if inputs["intermediate_steps"] else [
+            AgentAction("timed_search", {"query": "sleep"}, ""),
+            AgentAction("timed_search", {"query": "stress"}, ""),
+        ]),
+        tools=[timed_search], return_intermediate_steps=True, tool_timeout=0.1)
+
+    result = executor.invoke({"input": "hi"})
+    time.sleep(0.4)
+
+    assert all("did not answer in time" in observation for _, observation in result["intermediate_steps"])
+    assert len(remaining_times) == 1
+    assert remaining_times[0] <= 0.1
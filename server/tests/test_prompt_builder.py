@@ -0,0 +1,36 @@
+import sys
+sys.path.append(".")
+
+from agents.prompt_builder import build_agent_prompt
+
+
+def format_prompt(prompt, user_id, message):
+    return prompt.format_messages(
+        past_summaries=f"summaries of {user_id}",
+        session_context="",
+        user_context=f"facts about {user_id}",
+        user_id=user_id,
+        chat_turns=[],
+        input=message,
+        agent_scratchpad=[],
+    )
+
+
+def test_static_prefix_shared_across_users():
+    """Test to ensure the prompt starts with the same system message and tool instructions for every user."""
+    prompt = build_agent_prompt("You are {a} companion.", ("agent_facts", "web_search_google"))
+
+    first = format_prompt(prompt, "1", "hi")
+    second = format_prompt(prompt, "2", "hello")
+
+    assert first[0].content == second[0].content
+    assert first[0].content.startswith("You are {a} companion.")
+    assert "'web_search_google' tool" in first[0].content
+    assert "generate_suggestions" not in first[0].content
+    assert "user_id:1" in first[1].content and "user_id:1" not in first[0].content
+
+
+def test_prompt_compiled_once_per_configuration():
+    """Test to ensure the prompt of a configuration is only compiled once."""
+    assert build_agent_prompt("system", ("agent_facts",)) is build_agent_prompt("system", ("agent_facts",))
+    assert build_agent_prompt("system", ("agent_facts",)) is not build_agent_prompt("system", ())
@@ -0,0 +1,108 @@
+import sys
+sys.path.append(".")
+
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents.mental_health_agent import MentalHealthAIAgent
+from services.response_cache import SemanticResponseCache, is_shareable_question
+from utils.consts import AGENT_TIMEOUT_RESPONSE
+
+
+def test_shareable_questions():
+    """
+    Test to ensure questions about the user, follow-ups and acknowledgements are never treated as shareable.
+    """
+    assert is_shareable_question("Who built you?")
+    assert is_shareable_question("What is cognitive behavioral therapy?")
+    assert not is_shareable_question("Why do I feel anxious at night?")
+    assert not is_shareable_question("What did we talk about last time?")
+    assert not is_shareable_question("")
+    for follow_up in ("yes", "ok", "Why?", "Can you explain that?", "That sounds good",
+                      "What about the second one?", "Which exercise did you suggest?"):
+        assert not is_shareable_question(follow_up), follow_up
+
+
+def test_semantic_cache_threshold_and_ttl(monkeypatch):
+    """
+    Test to ensure only similar enough questions match, and that entries expire.
+    """
+    cache = SemanticResponseCache(threshold=0.9, ttl=60, maxsize=2)
+    cache.store([1.0, 0.0, 0.0], "Aria was built by a team of developers.")
+
+    assert cache.lookup([0.99, 0.05, 0.0]) == "Aria was built by a team of developers."
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+
+    now = time.monotonic()
+    monkeypatch.setattr("services.response_cache.time.monotonic", lambda: now + 120)
+    assert cache.lookup([1.0, 0.0, 0.0]) is None
+
+
+def test_responses_built_with_user_context_not_stored(monkeypatch):
+    """
+    Test to ensure a response is only cached if it was built without earlier turns, the user's summaries and facts.
+    """
+    cache = SemanticResponseCache()
+    monkeypatch.setattr("agents.mental_health_agent.response_cache", cache)
+    monkeypatch.setattr("agents.mental_health_agent.get_user_name", lambda user_id: None)
+
+    inputs = {"chat_turns": [HumanMessage(content="I can't sleep lately")], "past_summaries": "", "user_context": ""}
+    MentalHealthAIAgent.cache_response([1.0, 0.0], inputs, {"intermediate_steps": []}, "CBT is a talk therapy.", "user")
+    assert cache.lookup([1.0, 0.0]) is None
+
+    inputs["chat_turns"] = [HumanMessage(content=""), AIMessage(content="Hi, how are you feeling today?")]
+    MentalHealthAIAgent.cache_response([1.0, 0.0], inputs, {"intermediate_steps": []}, "CBT is a talk therapy.", "user")
+    assert cache.lookup([1.0, 0.0]) == "CBT is a talk therapy."
+
+
+def test_cut_short_responses_not_stored(monkeypatch):
+    """
+    Test to ensure responses of runs that ran out of time, or answered without a tool's results, are not cached.
+    """
+    cache = SemanticResponseCache()
+    monkeypatch.setattr("agents.mental_health_agent.response_cache", cache)
+    monkeypatch.setattr("agents.mental_health_agent.get_user_name", lambda user_id: None)
+    inputs = {"chat_turns": [], "past_summaries": "", "user_context": ""}
+
+    MentalHealthAIAgent.cache_response([1.0, 0.0], inputs, {"intermediate_steps": [], "stopped": True}, AGENT_TIMEOUT_RESPONSE, "user")
+    MentalHealthAIAgent.cache_response([0.0, 1.0], inputs, {"intermediate_steps": [], "tool_timed_out": True}, "CBT is a talk therapy.", "user")
+
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.lookup([0.0, 1.0]) is None
+
+
+def test_follow_up_answered_with_its_history(monkeypatch):
+    """
+    Test to ensure a follow-up such as "yes" mid-session is answered with the session's history, and skips the cache.
+    """
+    cache = SemanticResponseCache()
+    cache.store([1.0, 0.0], "A cached answer.")
+    monkeypatch.setattr("agents.mental_health_agent.response_cache", cache)
+
+    history = [HumanMessage(content="I can't sleep"), AIMessage(content="Would you like to try a breathing exercise?")]
+    agent = MentalHealthAIAgent.__new__(MentalHealthAIAgent)
+    monkeypatch.setattr(agent, "get_session_window", lambda user_id, chat_id: (f"{user_id}-{chat_id}", history))
+    monkeypatch.setattr(agent, "get_past_context", lambda user_id, message: "")
+    monkeypatch.setattr(agent, "save_turn", lambda session_id, message, response: None)
+    monkeypatch.setattr(MentalHealthAIAgent, "get_user_context", staticmethod(lambda user_id: ""))
+    monkeypatch.setattr(MentalHealthAIAgent, "get_session_context", staticmethod(lambda user_id, chat_id: ""))
+
+    class FakeEmbeddings:
+        embedded = []
+
+        def embed_query(self, message):
+            self.embedded.append(message)
+            return [1.0, 0.0]
+
+    class FakeExecutor:
+        def invoke(self, inputs, config=None):
+            self.inputs = inputs
+            return {"output": "Great, breathe in for four counts.", "intermediate_steps": []}
+
+    agent.embedding_model = FakeEmbeddings()
+    agent.agent_executor = FakeExecutor()
+
+    assert agent.run("yes", user_id="user", chat_id=1) == "Great, breathe in for four counts."
+    assert agent.agent_executor.inputs["chat_turns"] == history
+    assert agent.embedding_model.embedded == []
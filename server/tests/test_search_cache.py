@@ -0,0 +1,36 @@
+import sys
+sys.path.append(".")
+
+from utils.search_cache import cached_search, clear_search_cache, get_search_cache_stats
+
+
+def test_search_results_cached_by_normalized_query():
+    """Test to ensure repeated searches are served from the cache and counted per provider."""
+    clear_search_cache()
+    calls = []
+
+    @cached_search("google")
+    def search(query):
+        calls.append(query)
+        return f"results for {query}"
+
+    assert search("Coping with  Stress") == "results for Coping with  Stress"
+    assert search("  coping with stress ") == "results for Coping with  Stress"
+    assert len(calls) == 1
+    assert get_search_cache_stats()["google"] == {"hits": 1, "misses": 1}
+
+
+def test_failed_searches_not_cached():
+    """Test to ensure failed searches are retried instead of cached."""
+    clear_search_cache()
+    calls = []
+
+    @cached_search("bing")
+    def search(query):
+        calls.append(query)
+        return None
+
+    assert search("sleep tips") is None
+    assert search("sleep tips") is None
+    assert len(calls) == 2
+    assert get_search_cache_stats()["bing"] == {"hits": 0, "misses": 2}
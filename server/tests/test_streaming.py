@@ -0,0 +1,39 @@
+import sys
+sys.path.append(".")
+
+from queue import Queue
+
+from langchain_core.agents import AgentFinish
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from agents.parallel_executor import ParallelAgentExecutor
+from agents.streaming import QueueCallbackHandler
+
+
+def test_tokens_streamed_before_final_answer():
+    """
+    Test to ensure the model's tokens reach the queue while the run is in progress, before its final answer,
+    even when the agent invokes the model instead of streaming it.
+    """
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="Take a slow breath")]))
+    agent = (
+        RunnableLambda(lambda inputs: inputs["input"])
+        | llm
+        | RunnableLambda(lambda message: AgentFinish({"output": message.content}, message.content))
+    )
+    executor = ParallelAgentExecutor(agent=agent, tools=[], stream_runnable=False)
+
+    event_queue = Queue()
+    result = executor.invoke({"input": "hi"}, config={"callbacks": [QueueCallbackHandler(event_queue)]})
+    event_queue.put({"event": "final", "data": result["output"]})
+
+    events = []
+    while not event_queue.empty():
+        events.append(event_queue.get())
+
+    tokens = [event["data"] for event in events[:-1]]
+    assert len(tokens) > 1
+    assert all(event["event"] == "token" for event in events[:-1])
+    assert "".join(tokens) == events[-1]["data"] == "Take a slow breath"
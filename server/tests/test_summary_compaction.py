@@ -0,0 +1,62 @@
+import sys
+sys.path.append(".")
+
+from datetime import datetime
+
+from models.chat_digest import ChatDigest, DigestPeriod
+from services.summary_compaction import SummaryCompactionScheduler
+
+
+class FakeDigestAgent:
+    def get_digest_from_summaries(self, texts):
+        return " | ".join(texts)
+
+
+def test_compact_user_is_idempotent(db, monkeypatch):
+    """Test to ensure compacting twice, or after a late summary arrives, never rolls a summary in twice."""
+    user_id = "compaction_user"
+    now = datetime(2024, 6, 30, 12)
+    monday = int(datetime(2024, 6, 3, 9).timestamp())
+    for offset, text in enumerate(["first", "second"]):
+        db["chat_summaries"].insert_one({"user_id": user_id, "chat_id": monday + offset * 3600, "summary_text": text})
+
+    scheduler = SummaryCompactionScheduler()
+    monkeypatch.setattr(scheduler, "get_agent", lambda: FakeDigestAgent())
+
+    scheduler.compact_user(user_id, now)
+    scheduler.compact_user(user_id, now)
+
+    db["chat_summaries"].insert_one({"user_id": user_id, "chat_id": monday + 7200, "summary_text": "late"})
+    scheduler.compact_user(user_id, now)
+
+    digests = list(db["chat_digests"].find({"user_id": user_id}))
+    assert len(digests) == 1
+    assert digests[0]["summary_text"] == "first | second | late"
+    assert digests[0]["source_count"] == 3
+    assert db["chat_summaries"].count_documents({"user_id": user_id, "compacted": {"$ne": True}}) == 0
+
+
+def test_compact_all_rolls_weekly_digests_of_compacted_users(db, monkeypatch):
+    """Test to ensure weekly digests are rolled into monthly ones even when the user has no summaries left to compact."""
+    user_id = "monthly_compaction_user"
+    now = datetime(2024, 12, 30, 12)
+    week_start = int(datetime(2024, 6, 3).timestamp())
+    db["chat_digests"].insert_one({
+        "_id": ChatDigest.get_digest_id(user_id, DigestPeriod.WEEK, week_start),
+        "user_id": user_id,
+        "period": DigestPeriod.WEEK.value,
+        "period_start": week_start,
+        "start_chat_id": week_start + 3600,
+        "end_chat_id": week_start + 7200,
+        "source_count": 2,
+        "summary_text": "a calm week",
+    })
+
+    scheduler = SummaryCompactionScheduler()
+    monkeypatch.setattr(scheduler, "get_agent", lambda: FakeDigestAgent())
+    scheduler.compact_all(now)
+
+    weekly = db["chat_digests"].find_one({"user_id": user_id, "period": DigestPeriod.WEEK.value})
+    monthly = db["chat_digests"].find_one({"user_id": user_id, "period": DigestPeriod.MONTH.value})
+    assert weekly["compacted"] is True
+    assert monthly["summary_text"] == "a calm week"
@@ -0,0 +1,40 @@
+import sys
+sys.path.append(".")
+
+from langchain_core.messages import AIMessage, HumanMessage, trim_messages
+
+from utils.token_counter import TokenCounter
+
+
+def test_token_counter_batches_and_caches(monkeypatch):
+    """
+    Test to ensure only texts that are not cached yet are tokenized, in a single batch.
+    """
+    counter = TokenCounter()
+    batches = []
+    encode = counter._encode
+    monkeypatch.setattr(counter, "_encode", lambda texts: batches.append(list(texts)) or encode(texts))
+
+    first = counter.count_texts(["hello world", "", "how are you"])
+    second = counter.count_texts(["how are you", "fine thanks"])
+
+    assert first[1] == 0
+    assert second[0] == first[2]
+    assert batches == [["hello world", "how are you"], ["fine thanks"]]
+
+
+def test_token_counter_trims_messages():
+    """
+    Test to ensure the counter can be used as the token counter of trim_messages.
+    """
+    counter = TokenCounter()
+    messages = [
+        HumanMessage(content="word " * 100),
+        AIMessage(content="reply"),
+        HumanMessage(content="short question"),
+        AIMessage(content="short answer"),
+    ]
+
+    trimmed = trim_messages(messages, max_tokens=20, strategy="last", token_counter=counter, start_on="human")
+
+    assert [message.content for message in trimmed] == ["short question", "short answer"]
@@ -0,0 +1,35 @@
+import sys
+sys.path.append(".")
+
+from agents.tool_router import select_tools
+
+TOOLS = [
+    "generate_suggestions",
+    "web_search_youtube",
+    "web_search_google",
+    "web_search_tavily",
+    "location_search_gplaces",
+    "web_search_bing",
+    "user_profile_retrieval",
+    "agent_facts",
+    "user_journey_retrieval",
+]
+
+
+def test_small_talk_only_gets_agent_facts():
+    """Test to ensure messages that need no tool are only given the always-on tools."""
+    assert select_tools("hi", TOOLS) == ["agent_facts"]
+
+
+def test_tools_selected_by_keywords():
+    """Test to ensure messages are given the tools their keywords call for."""
+    assert select_tools("I feel stressed, any meditation videos?", TOOLS) == [
+        "agent_facts", "generate_suggestions", "web_search_youtube"]
+    assert select_tools("Is there a therapist near me?", TOOLS) == ["agent_facts", "location_search_gplaces"]
+
+
+def test_single_web_search_tool_selected():
+    """Test to ensure web searches get one search tool, preferring the provider the user names."""
+    assert select_tools("Find articles about mindfulness", TOOLS) == ["agent_facts", "web_search_tavily"]
+    assert select_tools("Search bing for mindfulness", TOOLS) == ["agent_facts", "web_search_bing"]
+    assert select_tools("Find articles about mindfulness", ["web_search_google"]) == ["web_search_google"]
@@ -1,11 +1,11 @@
 """ This module contains the agent functions that interact with the external APIs. """
 import os
-from langchain_google_community import  GoogleSearchAPIWrapper, GoogleSearchResults, GooglePlacesTool, GooglePlacesAPIWrapper
-from langchain_community.utilities import BingSearchAPIWrapper
-from langchain_community.tools import YouTubeSearchTool
 from azure.core.credentials import AzureKeyCredential
 from azure.ai.textanalytics import TextAnalyticsClient
 
+from utils.search_cache import cached_search
+from utils.search_clients import get_google_search_client, get_bing_search_client, get_youtube_search_tool, get_tavily_search_tool
+
 
 # Initialize Azure Text Analytics Client
 text_analytics_key = os.getenv("AZURE_TEXT_ANALYTICS_KEY")
@@ -16,6 +16,7 @@ text_analytics_client = TextAnalyticsClient(endpoint=text_analytics_endpoint, cr
 
 
 
+@cached_search("google")
 def get_google_search_results(query):
     """
     Uses Google Custom Search to fetch search results for a given query.
@@ -28,8 +29,7 @@ def get_google_search_results(query):
     """
 
     try:
-        google_search_wrapper = GoogleSearchAPIWrapper(k=3)
-        search_results = google_search_wrapper.run(query)
+        search_results = get_google_search_client().run(query)
         print("Search results obtained:", search_results)
 
         # Ensure the results are JSON-serializable
@@ -37,13 +37,14 @@ def get_google_search_results(query):
         return search_results
     
     except Exception as e:
-        print(f"Failed to fetch Google search results: {e}", exc_info=True)
+        print(f"Failed to fetch Google search results: {e}")
         return None
     
 
 
 
     
+@cached_search("youtube")
 def get_youtube_search_results(query):
     """
     Uses YouTube Search to fetch search results for a given query.
@@ -55,21 +56,21 @@ def get_youtube_search_results(query):
         list: A list of search results with titles, descriptions, and video links.
     """
     try:
-        youtube_search_tool = YouTubeSearchTool()
-        search_results = youtube_search_tool.run(query)
+        search_results = get_youtube_search_tool().run(query)
         print("Search results obtained:", search_results)
 
         # Ensure the results are JSON-serializable
         return search_results
 
     except Exception as e:
-        print(f"Failed to fetch YouTube search results: {e}", exc_info=True)
+        print(f"Failed to fetch YouTube search results: {e}")
         return None
 
 
 
 
 
+@cached_search("bing")
 def get_bing_search_results(query):
     """
     Uses Bing Search to fetch search results for a given query.
@@ -81,21 +82,44 @@ def get_bing_search_results(query):
         list: A list of search results with titles and links.
     """
     try:
-        bing_search_wrapper = BingSearchAPIWrapper()
-        search_results = bing_search_wrapper.run(query)
+        search_results = get_bing_search_client().run(query)
         print("Search results obtained:", search_results)
 
         # Ensure the results are JSON-serializable
         return search_results
 
     except Exception as e:
-        print(f"Failed to fetch Bing search results: {e}", exc_info=True)
+        print(f"Failed to fetch Bing search results: {e}")
         return None
     
 
 
 
 
+@cached_search("tavily")
+def get_tavily_search_results(query):
+    """
+    Uses Tavily Search to fetch search results for a given query.
+
+    Args:
+        query (str): The search query.
+
+    Returns:
+        list: A list of search results with URLs and content.
+    """
+    try:
+        search_results = get_tavily_search_tool().run(query)
+        print("Search results obtained:", search_results)
+        return search_results
+
+    except Exception as e:
+        print(f"Failed to fetch Tavily search results: {e}")
+        return None
+
+
+
+
+
 def generate_suggestions(mood, user_input):
     """
     Generates personalized activities or coping mechanisms based on the user's mood and sentiment using a language model.
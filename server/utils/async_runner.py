@@ -0,0 +1,59 @@
+"""
+This module runs coroutines from synchronous code on a single event loop that lives for the whole process,
+instead of creating and tearing down a loop with `asyncio.run` on every call.
+"""
+
+import asyncio
+import threading
+from typing import Any, Coroutine, Iterable
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_thread: threading.Thread | None = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the shared background event loop, starting it on a daemon thread the first time.
+    """
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="async-runner", daemon=True)
+            _loop_thread.start()
+
+    return _loop
+
+
+def run_async(coroutine: Coroutine, timeout: float = None) -> Any:
+    """
+    Runs a coroutine on the shared event loop and waits for its result.
+    Safe to call from any thread, including threads of an async server that already run their own loop.
+
+    Args:
+        coroutine (Coroutine): The coroutine to run.
+        timeout (float): If set, the number of seconds to wait before raising a TimeoutError.
+    """
+    loop = get_event_loop()
+    if threading.current_thread() is _loop_thread:
+        coroutine.close()
+        raise RuntimeError("run_async cannot be called from a coroutine running on the shared event loop")
+
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result(timeout)
+
+
+def gather_async(coroutines: Iterable[Coroutine], timeout: float = None) -> list:
+    """
+    Runs coroutines concurrently on the shared event loop and returns their results in order.
+
+    Args:
+        coroutines (Iterable[Coroutine]): The coroutines to run.
+        timeout (float): If set, the number of seconds to wait for all of them before raising a TimeoutError.
+    """
+    coroutines = list(coroutines)
+
+    async def gather():
+        return await asyncio.gather(*coroutines)
+
+    return run_async(gather(), timeout)
@@ -0,0 +1,91 @@
+"""
+This module contains utility functions to compress large text fields before they are stored,
+and to read them back transparently, whether they were compressed or not.
+"""
+
+import logging
+import zlib
+from functools import lru_cache
+
+from bson.binary import Binary
+
+from utils.consts import COMPRESSION_SETTINGS
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# First byte of a compressed payload, identifying the codec used to compress it
+ZLIB_PREFIX = b"\x01"
+ZSTD_PREFIX = b"\x02"
+
+
+@lru_cache(maxsize=None)
+def get_codec(collection_name: str) -> str | None:
+    """
+    Returns the codec configured for a collection, or None if its fields are not compressed.
+    Falls back to zlib when zstd is configured but the zstandard package is not installed.
+    """
+    settings = COMPRESSION_SETTINGS.get(collection_name)
+    if not settings:
+        return None
+
+    codec = settings.get("codec")
+    if codec == "zstd" and zstandard is None:
+        logger.warning("zstandard is not installed, compressing with zlib instead")
+        return "zlib"
+
+    return codec
+
+
+def compress_text(text: str, collection_name: str) -> str | Binary:
+    """
+    Compresses a text stored in the given collection if it is larger than the collection's threshold.
+
+    Args:
+        text (str): The text to store.
+        collection_name (str): The collection the text is stored in.
+
+    Returns:
+        The text unchanged if it is small or not worth compressing, otherwise the compressed payload as BSON binary.
+    """
+    codec = get_codec(collection_name)
+    if not text or not codec:
+        return text
+
+    data = text.encode("utf-8")
+    if len(data) < COMPRESSION_SETTINGS[collection_name]["min_bytes"]:
+        return text
+
+    if codec == "zstd":
+        payload = ZSTD_PREFIX + zstandard.ZstdCompressor().compress(data)
+    elif codec == "zlib":
+        payload = ZLIB_PREFIX + zlib.compress(data)
+    else:
+        raise ValueError(f"Unknown compression codec '{codec}' for collection '{collection_name}'")
+
+    if len(payload) >= len(data):
+        return text
+
+    return Binary(payload)
+
+
+def decompress_text(value: str | bytes | None) -> str | None:
+    """
+    Returns the text of a stored field, decompressing it if it was compressed.
+    """
+    if not isinstance(value, bytes):
+        return value
+
+    prefix, payload = value[:1], value[1:]
+    if prefix == ZLIB_PREFIX:
+        return zlib.decompress(payload).decode("utf-8")
+    if prefix == ZSTD_PREFIX:
+        if zstandard is None:
+            raise RuntimeError("The zstandard package is required to read zstd-compressed fields")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+
+    raise ValueError("Unknown compression codec in stored field")
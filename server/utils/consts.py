@@ -1,8 +1,80 @@
 APP_NAME = "mental-health"
 AGENT_NAME = "Aria"
 
-PROCESSING_STEP = 1 # The chat turn upon which the app would update the database
+PROCESSING_STEP = 5 # Number of chat turns between background updates of the chat summary
 CONTEXT_LENGTH_LIMIT=4096 
+TOKENIZER_ENCODING = "cl100k_base" # The tiktoken encoding used to count tokens locally when the deployment's model is unknown
+TOKEN_COUNT_CACHE_SIZE = 4096 # Number of recently counted texts whose token counts are remembered
+
+SUMMARY_CONTEXT_TOKEN_LIMIT = 1024 # Token budget for past chat summaries included in the prompt
+SUMMARY_CACHE_TTL = 600 # Seconds before a user's cached summaries are re-read from the database
+SUMMARY_CACHE_SIZE = 1024 # Maximum number of users whose summaries are cached
+SUMMARY_VERSION_TTL = 5 # Seconds before a user's summary version is re-read, to notice summaries written by other processes
+SUMMARY_RETRIEVAL_TOP_K = 3 # Number of past summaries retrieved by relevance to the user's message
+
+WEEKLY_DIGEST_AGE_DAYS = 14 # Age after which chat summaries are rolled into weekly digests
+MONTHLY_DIGEST_AGE_DAYS = 90 # Age after which weekly digests are rolled into monthly digests
+DIGEST_CONTEXT_LIMIT = 3 # Number of digests included in the prompt
+DIGEST_CONTEXT_TOKEN_LIMIT = 512 # Token budget for digests included in the prompt
+
+SUMMARY_TRANSCRIPT_TOKEN_LIMIT = 24000 # Maximum transcript tokens summarized at the end of a chat, newest kept
+SUMMARY_CHUNK_TOKEN_LIMIT = 3000 # Transcripts longer than this are summarized in chunks
+SUMMARY_MAX_CONCURRENCY = 4 # Maximum number of chunks summarized at the same time
+FINALIZE_MAX_WORKERS = 4 # Threads finalizing chats in the background when no Celery broker is configured
+FINALIZE_JOB_STALE_AFTER = 900 # Seconds after which a queued or running finalization job is assumed lost and queued again
+
+HISTORY_WINDOW_TOKEN_LIMIT = 2000 # Token budget for the recent chat messages included in the prompt
+HISTORY_WINDOW_MAX_MESSAGES = 100 # Maximum number of recent chat messages read for the prompt
+CHAT_BUCKET_SIZE = 50 # Maximum number of chat messages stored in one bucket document
+CONTEXT_PREFETCH_WORKERS = 16 # Threads fetching the history, summaries, profile and journey of turns concurrently
+CONTEXT_PREFETCH_TIMEOUT = 10 # Seconds a turn waits for its prefetched context, shortened to the time left before the run's deadline
+SESSION_CACHE_TTL = 3600 # Seconds a validated chat session is trusted before it is checked against the database again
+SESSION_CACHE_SIZE = 10000 # Maximum number of validated chat sessions cached
+RESPONSE_CACHE_SIMILARITY = 0.95 # Minimum cosine similarity for a question to be answered from the response cache
+RESPONSE_CACHE_TTL = 86400 # Seconds a cached response to a shareable question is kept
+RESPONSE_CACHE_SIZE = 1024 # Maximum number of cached responses
+
+SEARCH_CACHE_SIZE = 2048 # Maximum number of cached web search results, least recently used evicted first
+SEARCH_CACHE_TTLS = { # Seconds search results are cached, per provider
+    "google": 6 * 3600,
+    "bing": 6 * 3600,
+    "youtube": 24 * 3600,
+    "tavily": 3600,
+}
+
+SEARCH_HTTP_POOL_SIZE = 16 # Keep-alive connections kept per search provider host
+SEARCH_HTTP_TIMEOUT = (3.05, 10) # Connect and read timeouts of search requests, in seconds
+SEARCH_MIN_TIMEOUT = 0.5 # Shortest timeout given to a search request when its deadline is close
+
+TOOL_CALL_WORKERS = 8 # Threads running the tool calls of agent steps concurrently
+TOOL_CALL_TIMEOUT = 20 # Seconds an agent step waits for its tool calls before answering without them
+
+AGENT_RUN_TIMEOUT = 45 # Seconds an agent has to answer a message, including its LLM and tool calls
+AGENT_MAX_ITERATIONS = 6 # Maximum number of tool-calling steps of an agent run
+LLM_REQUEST_TIMEOUT = 30 # Seconds an LLM request may take, shortened to the time left before the run's deadline
+LLM_MIN_TIMEOUT = 1 # Shortest timeout given to an LLM request
+LLM_MAX_RETRIES = 1 # Number of times a failed LLM request is retried, if the run's deadline leaves time for it
+LLM_RETRY_BACKOFF = 0.5 # Seconds before the first retry of a failed LLM request, doubled on each later retry
+
+# Large text fields are compressed per collection, remove a collection to store its fields as plain text.
+# The "zstd" codec requires the zstandard package and falls back to "zlib" without it.
+COMPRESSION_SETTINGS = {
+    "chat_turns": {"codec": "zlib", "min_bytes": 1024}, # Compresses each message's History
+    "chat_turn_buckets": {"codec": "zlib", "min_bytes": 1024}, # Compresses each bucketed message's History
+    "chat_summaries": {"codec": "zlib", "min_bytes": 1024}, # Compresses summary_text
+}
+
+ANONYMOUS_USER_ID = "0" # The user ID shared by anonymous users
+
+AGENT_TIMEOUT_RESPONSE = "I'm sorry, this is taking me longer than expected. Could you give me a moment and ask again?"
+
+ANONYMOUS_GREETING = f"Hi, I'm {AGENT_NAME}, your mental health companion. This is a safe space to talk about whatever is on your mind. How are you feeling today?"
+FIRST_SESSION_GREETING = f"Hi, I'm {AGENT_NAME}, your mental health companion. I'm glad you're here. To start, could you tell me a little about how you've been feeling lately and what you hope to get out of our conversations?"
+# Added to the prompt of every turn of a user's first session
+FIRST_SESSION_INSTRUCTIONS = """
+    This is your first session with the patient. Be polite and introduce yourself in a friendly and inviting manner.
+    In this session, do your best to understand what the user hopes to achieve through your service, and derive a therapy style fitting to their needs.
+    """
 
 SYSTEM_MESSAGE = f"""
     Your name is {AGENT_NAME}, you are a therapy agent. 
@@ -18,6 +90,19 @@ SYSTEM_MESSAGE = f"""
     
 """
 
+# System instructions of each tool, only included in the prompt of agents given the tool
+TOOL_INSTRUCTIONS = {
+    "agent_facts": "You can retrieve information about the AI using the 'agent_facts' tool.",
+    "generate_suggestions": "You can generate suggestions using the 'generate_suggestions' tool.",
+    "web_search_google": "You can search for information using the 'web_search_google' tool.",
+    "web_search_bing": "You can search for information using the 'web_search_bing' tool.",
+    "web_search_youtube": "You can search for information using the 'web_search_youtube' tool.",
+    "web_search_tavily": "You can search for information using the 'web_search_tavily' tool.",
+    "location_search_gplaces": "You can search for locations using the 'location_search_gplaces' tool.",
+    "user_profile_retrieval": "You can retrieve your user profile using the 'user_profile_retrieval' tool.",
+    "user_journey_retrieval": "You can retrieve your user journey using the 'user_journey_retrieval' tool.",
+}
+
 AGENT_FACTS = [
     {
         "sample_query": "What is your name?",
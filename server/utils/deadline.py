@@ -0,0 +1,47 @@
+"""
+This module tracks the wall-clock deadline of the current request, so that the LLM calls, tool calls and retries
+made on its behalf can bound their own timeouts by the time it has left.
+The deadline is held in a context variable, which follows the request into threads started with a copy of its context.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Sets a deadline the given number of seconds from now for the code run in this context.
+    An earlier deadline that is already set is kept.
+
+    Args:
+        seconds (float): The time budget, in seconds.
+    """
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires_at if current is None else min(current, expires_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_remaining_time() -> float | None:
+    """
+    Returns the number of seconds left before the current deadline, or None if no deadline is set.
+    """
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return max(expires_at - time.monotonic(), 0.0)
+
+
+def bound_timeout(timeout: float) -> float:
+    """
+    Returns the given timeout, shortened to the time left before the current deadline.
+    """
+    remaining = get_remaining_time()
+    return timeout if remaining is None else min(timeout, remaining)
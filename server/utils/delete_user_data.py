@@ -1,6 +1,8 @@
 """This module contains a function to delete all data for a user from the database."""
 import logging
 from services.azure_mongodb import MongoDBClient
+from services.db.chat_summary import invalidate_summary_cache
+from services.db.chat_session import invalidate_chat_sessions
 
 def delete_user_data(user_id):
     db_client = MongoDBClient.get_client()
@@ -8,8 +10,11 @@ def delete_user_data(user_id):
 
     collections_to_clear = [
         'user_journeys', 'chat_summaries', 'check_ins', 
-        'search_history', 'user_materials', 'user_entities'
+        'search_history', 'user_materials', 'user_entities',
+        'chat_digests', 'user_greetings'
     ]
     for collection in collections_to_clear:
         db[collection].delete_many({"user_id": user_id})
+    invalidate_summary_cache(user_id)
+    invalidate_chat_sessions(user_id)
     logging.info(f"All data for user {user_id} deleted successfully")
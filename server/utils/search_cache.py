@@ -0,0 +1,77 @@
+""" This module contains a shared cache of web search results, used by the agent's search tools. """
+import logging
+import re
+import threading
+from collections import defaultdict
+from functools import wraps
+
+from cachetools import TLRUCache
+
+from utils.consts import SEARCH_CACHE_SIZE, SEARCH_CACHE_TTLS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_CACHE_TTL = 3600
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases a query and collapses its whitespace, so trivially different queries share a cache entry."""
+    return re.sub(r"\s+", " ", str(query)).strip().lower()
+
+
+def get_expiry(key, value, now):
+    provider, _ = key
+    return now + SEARCH_CACHE_TTLS.get(provider, DEFAULT_SEARCH_CACHE_TTL)
+
+
+_search_cache = TLRUCache(maxsize=SEARCH_CACHE_SIZE, ttu=get_expiry)
+_search_cache_lock = threading.Lock()
+_search_cache_stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+
+def cached_search(provider: str):
+    """
+    Caches the results of a search function by provider and normalized query.
+    Entries expire after the provider's TTL, and the least recently used ones are evicted when the cache is full.
+    Failed searches, which return None, are not cached.
+
+    Args:
+        provider (str): The name of the search provider, used in the cache key and to pick the TTL.
+    """
+    def decorator(search):
+        @wraps(search)
+        def wrapper(query):
+            key = (provider, normalize_query(query))
+            with _search_cache_lock:
+                results = _search_cache.get(key)
+                stats = _search_cache_stats[provider]
+                if results is not None:
+                    stats["hits"] += 1
+                    logger.debug(f"Search cache hit for {provider} query '{key[1]}'")
+                    return results
+                stats["misses"] += 1
+
+            results = search(query)
+            if results is not None:
+                with _search_cache_lock:
+                    _search_cache[key] = results
+
+            return results
+
+        return wrapper
+
+    return decorator
+
+
+def get_search_cache_stats() -> dict:
+    """
+    Returns the number of cache hits and misses of each search provider.
+    """
+    with _search_cache_lock:
+        return {provider: dict(stats) for provider, stats in _search_cache_stats.items()}
+
+
+def clear_search_cache():
+    with _search_cache_lock:
+        _search_cache.clear()
+        _search_cache_stats.clear()
@@ -0,0 +1,167 @@
+"""
+This module contains the long-lived clients used by the agent's search tools.
+Each client is created once per process, on first use, and sends its requests over a shared pool of
+keep-alive HTTP connections with explicit timeouts, so connection setup and TLS handshakes are not paid on every search.
+"""
+import threading
+import urllib.parse
+from functools import lru_cache
+
+import httplib2
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_google_community import GoogleSearchAPIWrapper
+from langchain_community.utilities import BingSearchAPIWrapper
+from langchain_community.utilities.tavily_search import TAVILY_API_URL, TavilySearchAPIWrapper
+from langchain_community.tools import YouTubeSearchTool
+from langchain_community.tools.tavily_search import TavilySearchResults
+from youtube_search import YoutubeSearch
+
+from utils.consts import SEARCH_HTTP_POOL_SIZE, SEARCH_HTTP_TIMEOUT, SEARCH_MIN_TIMEOUT
+from utils.deadline import bound_timeout
+
+YOUTUBE_SEARCH_ATTEMPTS = 3 # YouTube sometimes serves a page without results data
+
+_thread_local = threading.local()
+
+
+@lru_cache(maxsize=None)
+def get_http_session() -> requests.Session:
+    """
+    Returns the HTTP session shared by the search clients, which keeps connections to each provider alive.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=SEARCH_HTTP_POOL_SIZE, pool_maxsize=SEARCH_HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_search_timeout() -> tuple[float, float]:
+    """
+    Returns the connect and read timeouts of a search request, shortened to the time left before the current deadline,
+    so that a search the agent stopped waiting for does not hold on to its thread.
+    """
+    connect_timeout, read_timeout = SEARCH_HTTP_TIMEOUT
+    return (
+        max(bound_timeout(connect_timeout), SEARCH_MIN_TIMEOUT),
+        max(bound_timeout(read_timeout), SEARCH_MIN_TIMEOUT)
+    )
+
+
+def get_google_http() -> httplib2.Http:
+    """
+    Returns this thread's connection for the Google API client, with the read timeout of the current search.
+    httplib2 connections are not thread-safe, so each thread keeps its own and reuses it across searches.
+    """
+    http = getattr(_thread_local, "google_http", None)
+    if http is None:
+        http = httplib2.Http(timeout=SEARCH_HTTP_TIMEOUT[1])
+        _thread_local.google_http = http
+
+    # Connections kept alive from earlier searches keep the timeout they were opened with unless updated
+    timeout = get_search_timeout()[1]
+    http.timeout = timeout
+    for connection in http.connections.values():
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+
+    return http
+
+
+class PooledGoogleSearchAPIWrapper(GoogleSearchAPIWrapper):
+    def _google_search_results(self, search_term: str, **kwargs) -> list[dict]:
+        cse = self.search_engine.cse()
+        if self.siterestrict:
+            cse = cse.siterestrict()
+        results = cse.list(q=search_term, cx=self.google_cse_id, **kwargs).execute(http=get_google_http())
+        return results.get("items", [])
+
+
+class PooledBingSearchAPIWrapper(BingSearchAPIWrapper):
+    def _bing_search_results(self, search_term: str, count: int) -> list[dict]:
+        headers = {"Ocp-Apim-Subscription-Key": self.bing_subscription_key}
+        params = {
+            "q": search_term,
+            "count": count,
+            "textDecorations": True,
+            "textFormat": "HTML",
+            **self.search_kwargs,
+        }
+        response = get_http_session().get(self.bing_search_url, headers=headers, params=params, timeout=get_search_timeout())
+        response.raise_for_status()
+        search_results = response.json()
+        if "webPages" in search_results:
+            return search_results["webPages"]["value"]
+        return []
+
+
+class PooledTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+    def raw_results(
+        self,
+        query: str,
+        max_results: int = 5,
+        search_depth: str = "advanced",
+        include_domains: list[str] = [],
+        exclude_domains: list[str] = [],
+        include_answer: bool = False,
+        include_raw_content: bool = False,
+        include_images: bool = False,
+    ) -> dict:
+        params = {
+            "api_key": self.tavily_api_key.get_secret_value(),
+            "query": query,
+            "max_results": max_results,
+            "search_depth": search_depth,
+            "include_domains": include_domains,
+            "exclude_domains": exclude_domains,
+            "include_answer": include_answer,
+            "include_raw_content": include_raw_content,
+            "include_images": include_images,
+        }
+        response = get_http_session().post(f"{TAVILY_API_URL}/search", json=params, timeout=get_search_timeout())
+        response.raise_for_status()
+        return response.json()
+
+
+class PooledYoutubeSearch(YoutubeSearch):
+    def _search(self):
+        url = f"https://youtube.com/results?search_query={urllib.parse.quote_plus(self.search_terms)}"
+        for _ in range(YOUTUBE_SEARCH_ATTEMPTS):
+            response = get_http_session().get(url, timeout=get_search_timeout()).text
+            if "ytInitialData" in response:
+                break
+        else:
+            raise RuntimeError("YouTube did not return any search results data")
+
+        results = self._parse_html(response)
+        if self.max_results is not None:
+            return results[: self.max_results]
+        return results
+
+
+class PooledYouTubeSearchTool(YouTubeSearchTool):
+    def _search(self, person: str, num_results: int) -> str:
+        videos = PooledYoutubeSearch(person, num_results).to_dict()
+        return str(["https://www.youtube.com" + video["url_suffix"] for video in videos])
+
+
+@lru_cache(maxsize=None)
+def get_google_search_client() -> GoogleSearchAPIWrapper:
+    return PooledGoogleSearchAPIWrapper(k=3)
+
+
+@lru_cache(maxsize=None)
+def get_bing_search_client() -> BingSearchAPIWrapper:
+    return PooledBingSearchAPIWrapper()
+
+
+@lru_cache(maxsize=None)
+def get_youtube_search_tool() -> YouTubeSearchTool:
+    return PooledYouTubeSearchTool()
+
+
+@lru_cache(maxsize=None)
+def get_tavily_search_tool() -> TavilySearchResults:
+    return TavilySearchResults(api_wrapper=PooledTavilySearchAPIWrapper())
@@ -0,0 +1,188 @@
+"""
+This module contains utility functions to count tokens locally, without calling the LLM service.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Sequence
+
+import tiktoken
+from cachetools import LRUCache
+from langchain_core.messages import BaseMessage
+
+from utils.consts import TOKENIZER_ENCODING, TOKEN_COUNT_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Rough number of characters per token, used when the tokenizer files cannot be loaded
+CHARS_PER_TOKEN = 4
+# Key of the stored token count in a message's response metadata
+TOKEN_COUNT_KEY = "token_count"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = TOKENIZER_ENCODING) -> tiktoken.Encoding | None:
+    """
+    Returns the tiktoken encoding with the given name, loading it only once per process.
+    Returns None if the encoding files could not be loaded.
+    """
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer '{encoding_name}', estimating token counts instead: {e}")
+        return None
+
+
+def get_message_content(message: BaseMessage) -> str:
+    """
+    Returns the content of a message as text.
+    """
+    return message.content if isinstance(message.content, str) else json.dumps(message.content)
+
+
+class TokenCounter:
+    """
+    Counts tokens with the tokenizer of a model deployment, remembering the counts of recently seen texts.
+
+    An instance can be passed as the `token_counter` of `trim_messages`.
+
+    Args:
+        deployment (str): The name of the model deployment whose tokenizer is used.
+        cache_size (int): The number of text hashes whose token counts are remembered.
+    """
+
+    def __init__(self, deployment: str = None, cache_size: int = TOKEN_COUNT_CACHE_SIZE):
+        self.deployment = deployment
+        self.encoding = get_encoding(TokenCounter.get_encoding_name(deployment))
+        self._cache = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_encoding_name(deployment: str = None) -> str:
+        """
+        Returns the name of the encoding used by the model a deployment is named after,
+        or the default encoding for custom deployment names.
+        """
+        if deployment:
+            try:
+                return tiktoken.encoding_name_for_model(deployment)
+            except KeyError:
+                pass
+
+        return TOKENIZER_ENCODING
+
+    @staticmethod
+    def get_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _encode(self, texts: list[str]) -> list[int]:
+        if self.encoding is None:
+            return [-(-len(text) // CHARS_PER_TOKEN) for text in texts]
+
+        return [len(tokens) for tokens in self.encoding.encode_batch(texts, disallowed_special=())]
+
+    def count_texts(self, texts: Sequence[str]) -> list[int]:
+        """
+        Counts the tokens of each text, tokenizing all the texts that are not cached in a single batch.
+
+        Args:
+            texts (Sequence[str]): The texts to count tokens for.
+
+        Returns:
+            list[int]: The number of tokens in each text, in the same order.
+        """
+        keys = [TokenCounter.get_key(text) if text else None for text in texts]
+        counts = [0] * len(texts)
+
+        missing = []
+        with self._lock:
+            for index, key in enumerate(keys):
+                if key is None:
+                    continue
+                count = self._cache.get(key)
+                if count is None:
+                    missing.append(index)
+                else:
+                    counts[index] = count
+
+        if missing:
+            missing_counts = self._encode([texts[index] for index in missing])
+            with self._lock:
+                for index, count in zip(missing, missing_counts):
+                    counts[index] = count
+                    self._cache[keys[index]] = count
+
+        return counts
+
+    def count_text(self, text: str) -> int:
+        """
+        Counts the tokens of a single text.
+        """
+        return self.count_texts([text])[0]
+
+    def count_messages(self, messages: Sequence[BaseMessage]) -> list[int]:
+        """
+        Counts the tokens of each message's content, using the count stored with the message when available.
+
+        Args:
+            messages (Sequence[BaseMessage]): The messages to count tokens for.
+
+        Returns:
+            list[int]: The number of tokens in each message, in the same order.
+        """
+        counts = [message.response_metadata.get(TOKEN_COUNT_KEY) for message in messages]
+
+        missing = [index for index, count in enumerate(counts) if count is None]
+        if missing:
+            missing_counts = self.count_texts([get_message_content(messages[index]) for index in missing])
+            for index, count in zip(missing, missing_counts):
+                counts[index] = count
+
+        return counts
+
+    def __call__(self, messages: list[BaseMessage]) -> int:
+        """
+        Counts the total number of tokens in a list of messages.
+        """
+        return sum(self.count_messages(messages))
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(deployment: str = None) -> TokenCounter:
+    """
+    Returns the shared token counter of a model deployment, by default the completions deployment.
+    """
+    return TokenCounter(deployment or os.getenv("COMPLETIONS_DEPLOYMENT_NAME"))
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the number of tokens in a piece of text.
+
+    Args:
+        text (str): The text to count tokens for.
+
+    Returns:
+        int: The number of tokens in the text.
+    """
+    if not text:
+        return 0
+
+    return get_token_counter().count_text(text)
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    """
+    Counts the number of tokens in a message's content, using the count stored with the message when available.
+
+    Args:
+        message (BaseMessage): The message to count tokens for.
+
+    Returns:
+        int: The number of tokens in the message.
+    """
+    return get_token_counter().count_messages([message])[0]